@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Bulk-load historical readings from CSV or NDJSON files.
+
+Examples:
+    python airiq_import.py export-2024.csv
+    python airiq_import.py data/*.ndjson --chunk 10000 --concurrency 8
+    python airiq_import.py big.csv --rejects rejects.ndjson --skip-derived
+    python airiq_import.py fleet/fleet-*.ndjson --sensors fleet/sensors.json
+
+Each row needs sensor_id and ts (ISO 8601, or epoch milliseconds) plus any of
+pm25, pm10, co2, no2, temp_c, rh, battery, firmware; other columns are kept
+according to READINGS_RAW_JSON. Rows are read in chunks, validated a column
+at a time with numpy, and written with unordered insert_many, --concurrency
+chunks in flight at once. Rows that fail validation are counted (and written
+to --rejects if given) instead of stopping the import.
+
+Progress is saved to the --checkpoint file after every chunk, so re-running
+the same command after an interruption skips what was already written. The
+checkpoint also keeps the ts range of each file, so the rollups rebuilt at
+the end cover rows imported by earlier runs as well. NDJSON lines that are
+not JSON objects are rejected as "invalid json" with the raw line.
+Reading _ids are derived from (sensor_id, ts), which makes re-importing a row
+a no-op (reported as a duplicate). Time-series collections
+(READINGS_TIMESERIES=1) have no unique _id index, so there the chunks that
+were in flight when the import stopped can be written twice.
+
+--sensors loads sensor metadata (id, name, model, lat, lon, location_label,
+status) from a JSON array or NDJSON file, such as the sensors.json written by
+generate_fleet.py, and upserts it before the readings are imported, so the
+sensors have map positions. Sensors that are only referenced by readings are
+created with just their id.
+
+Afterwards sensors are created as needed, and sensor_latest and the rollups
+covering the imported range are rebuilt (skip with --skip-derived, e.g. when
+importing many files one by one, and run backfill_latest.py and
+rebuild_rollups.py at the end).
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+load_dotenv()
+
+from app.db import init_db, close_db
+from app.models import READINGS_RAW_JSON, Reading, Sensor
+from app.services.latest import rebuild_latest
+from app.services.rollups import rebuild_rollups
+from app.services.sensor_registry import sensor_registry
+
+METRICS = ("pm25", "pm10", "co2", "no2", "temp_c", "rh", "battery")
+COLUMNS = {"sensor_id", "ts", "firmware", *METRICS}
+# Plausible sensor ranges; anything outside is a bad row, not a reading
+RANGES = {
+    "pm25": (0, 1000),
+    "pm10": (0, 2000),
+    "co2": (0, 10000),
+    "no2": (0, 10),
+    "temp_c": (-60, 80),
+    "rh": (0, 100),
+    "battery": (0, 100),
+}
+# Readings more than a day ahead of the wall clock are rejected
+MAX_FUTURE_MS = 24 * 60 * 60 * 1000
+# Sensor fields --sensors may set
+SENSOR_FIELDS = ("name", "model", "lat", "lon", "location_label", "status")
+# Key of the placeholder row yielded for an NDJSON line that is not a JSON object
+INVALID_JSON = "_invalid_json"
+
+def parse_ts_ms(value) -> int:
+    """Epoch milliseconds from an ISO string or an epoch-ms number; -1 if invalid"""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return int(value) if math.isfinite(value) else -1
+        value = str(value).strip()
+        if value.isdigit():
+            return int(value)
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp() * 1000)
+    except (TypeError, ValueError, OverflowError):
+        return -1
+
+def _float_or_nan(value) -> float:
+    if value is None or value == "":
+        return math.nan
+    return float(value)
+
+def float_column(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """(float64 column with NaN for missing values, mask of unparseable values)"""
+    try:
+        column = np.array([_float_or_nan(v) for v in values], dtype=np.float64)
+        return column, np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    # Slow path, only for chunks that contain garbage
+    column = np.full(len(values), math.nan)
+    bad = np.zeros(len(values), dtype=bool)
+    for i, v in enumerate(values):
+        try:
+            column[i] = _float_or_nan(v)
+        except (TypeError, ValueError):
+            bad[i] = True
+    return column, bad
+
+def reading_id(sensor_id: str, ts_ms: int) -> ObjectId:
+    """Deterministic ObjectId: reading time in the timestamp bytes, hash of (sensor, ts) after"""
+    digest = hashlib.blake2b(f"{sensor_id}|{ts_ms}".encode(), digest_size=8).digest()
+    seconds = max(0, min(ts_ms // 1000, 2**32 - 1))
+    return ObjectId(seconds.to_bytes(4, "big") + digest)
+
+def validate_chunk(rows: list[dict], now_ms: int):
+    """Validate a chunk; returns (documents, [(index, reason), ...] for rejected rows)"""
+    n = len(rows)
+    reasons = np.full(n, None, dtype=object)
+    reasons[[INVALID_JSON in r for r in rows]] = "invalid json"
+
+    sensor_ids = np.array([str(r.get("sensor_id") or "").strip() for r in rows], dtype=object)
+    reasons[(sensor_ids == "") & (reasons == None)] = "missing sensor_id"  # noqa: E711
+
+    ts_ms = np.array([parse_ts_ms(r.get("ts")) for r in rows], dtype=np.int64)
+    reasons[(ts_ms > now_ms + MAX_FUTURE_MS) & (reasons == None)] = "ts in the future"  # noqa: E711
+    reasons[(ts_ms < 0) & (reasons == None)] = "invalid ts"  # noqa: E711
+
+    columns = {}
+    present = np.zeros(n, dtype=bool)
+    for name in METRICS:
+        column, bad = float_column([r.get(name) for r in rows])
+        lo, hi = RANGES[name]
+        # NaN compares False, so missing values pass the range check
+        bad |= (column < lo) | (column > hi) | np.isinf(column)
+        reasons[bad & (reasons == None)] = f"invalid {name}"  # noqa: E711
+        present |= ~np.isnan(column)
+        columns[name] = column
+    reasons[~present & (reasons == None)] = "no measurements"  # noqa: E711
+
+    ok = np.flatnonzero(reasons == None)  # noqa: E711
+    docs = []
+    for i in ok:
+        row = rows[i]
+        sensor_id = sensor_ids[i]
+        ms = int(ts_ms[i])
+        doc = {
+            "_id": reading_id(sensor_id, ms),
+            "sensor_id": sensor_id,
+            "ts": datetime.fromtimestamp(ms / 1000, timezone.utc),
+        }
+        for name in METRICS:
+            value = columns[name][i]
+            doc[name] = None if math.isnan(value) else float(value)
+        doc["firmware"] = str(row["firmware"]) if row.get("firmware") not in (None, "") else None
+        doc["stats"] = None
+        if READINGS_RAW_JSON == "full":
+            doc["raw_json"] = row
+        elif READINGS_RAW_JSON == "extra":
+            doc["raw_json"] = {k: v for k, v in row.items() if k not in COLUMNS} or None
+        docs.append(doc)
+
+    rejected = [(int(i), reasons[i]) for i in np.flatnonzero(reasons != None)]  # noqa: E711
+    return docs, rejected
+
+def iter_rows(path: Path, fmt: str):
+    """Yield row dicts from a CSV (header row required) or NDJSON file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            # Malformed lines still count as rows so resume offsets stay stable;
+            # the raw line is kept for the rejects file
+            yield row if isinstance(row, dict) else {INVALID_JSON: line}
+
+def load_sensors(path: Path) -> list[dict]:
+    """Sensor metadata from a JSON array or an NDJSON file"""
+    text = path.read_text(encoding="utf-8")
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+async def upsert_sensors(sensors: list[dict]) -> int:
+    """Create or update sensors by id in one bulk write; returns how many were sent"""
+    ops = []
+    for sensor in sensors:
+        if not sensor.get("id"):
+            continue
+        update = {"$setOnInsert": {"installed_at": datetime.now(timezone.utc)}}
+        fields = {k: sensor[k] for k in SENSOR_FIELDS if k in sensor}
+        if fields:
+            update["$set"] = fields
+        ops.append(UpdateOne({"_id": sensor["id"]}, update, upsert=True))
+    if ops:
+        await Sensor.get_motor_collection().bulk_write(ops, ordered=False)
+    return len(ops)
+
+def file_format(path: Path, fmt: str) -> str:
+    if fmt != "auto":
+        return fmt
+    return "ndjson" if path.suffix.lower() in (".ndjson", ".jsonl", ".json") else "csv"
+
+class Checkpoint:
+    """Rows already written per input file, and the ts range they span, persisted as JSON"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files = json.loads(path.read_text()) if path.exists() else {}
+
+    def resume_from(self, source: Path) -> int:
+        """Rows to skip for source; 0 if it is new or changed since the checkpoint"""
+        entry = self.files.get(str(source.resolve()))
+        if not entry:
+            return 0
+        stat = source.stat()
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            print(f"  {source} changed since the last run, starting over")
+            return 0
+        return entry["rows"]
+
+    def ts_range(self, source: Path) -> list:
+        """[min_ts, max_ts] of the rows recorded for source ([None, None] if none)"""
+        entry = self.files.get(str(source.resolve())) or {}
+        return [
+            datetime.fromisoformat(entry[k]) if entry.get(k) else None
+            for k in ("min_ts", "max_ts")
+        ]
+
+    def save(self, source: Path, rows: int, ts_range: list, done: bool = False):
+        stat = source.stat()
+        lo, hi = ts_range
+        self.files[str(source.resolve())] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "rows": rows,
+            "done": done,
+            "min_ts": lo.isoformat() if lo else None,
+            "max_ts": hi.isoformat() if hi else None,
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.files, indent=2))
+        os.replace(tmp, self.path)
+
+class Importer:
+    """Streams files into the readings collection, several insert_many calls at a time"""
+
+    def __init__(self, args):
+        self.args = args
+        self.collection = Reading.get_motor_collection()
+        self.checkpoint = Checkpoint(Path(args.checkpoint))
+        self.rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.sensors_created = 0
+        # [min_ts, max_ts] per file, including rows from earlier (interrupted) runs
+        self.ranges: dict[Path, list] = {}
+        self.started = time.perf_counter()
+        self._last_report = 0.0
+
+    async def _insert(self, docs: list[dict]):
+        if not docs:
+            return
+        try:
+            result = await self.collection.insert_many(docs, ordered=False)
+            self.inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            others = [err for err in errors if err.get("code") != 11000]
+            if others:
+                raise
+            # Already imported on a previous (interrupted) run
+            self.duplicates += len(errors)
+            self.inserted += e.details.get("nInserted", 0)
+
+    def _report(self, source: Path, rows: int, final: bool = False):
+        now = time.perf_counter()
+        if not final and now - self._last_report < self.args.progress:
+            return
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.inserted / elapsed if elapsed else 0
+        print(
+            f"  {source.name}: {rows:,} rows read, {self.inserted:,} inserted, "
+            f"{self.duplicates:,} duplicate, {self.rejected:,} rejected ({rate:,.0f} rows/s)"
+        )
+
+    def _track_range(self, source: Path, docs: list[dict]):
+        # Widened before the chunk is written, so a saved range may cover a
+        # few rows that never landed; rebuilding a little more is harmless
+        current = self.ranges[source]
+        lo = min(d["ts"] for d in docs)
+        hi = max(d["ts"] for d in docs)
+        current[0] = lo if current[0] is None or lo < current[0] else current[0]
+        current[1] = hi if current[1] is None or hi > current[1] else current[1]
+
+    def imported_range(self) -> tuple[datetime | None, datetime | None]:
+        """Union of the ts ranges of every file handled, this run or before"""
+        lows = [lo for lo, _ in self.ranges.values() if lo]
+        highs = [hi for _, hi in self.ranges.values() if hi]
+        return (min(lows) if lows else None, max(highs) if highs else None)
+
+    async def import_file(self, source: Path):
+        fmt = file_format(source, self.args.format)
+        skip = self.checkpoint.resume_from(source)
+        entry = self.checkpoint.files.get(str(source.resolve()))
+        self.ranges[source] = self.checkpoint.ts_range(source) if skip else [None, None]
+        if skip and entry and entry.get("done"):
+            print(f"  {source} already imported, skipping")
+            return
+        if skip:
+            print(f"  resuming {source} after row {skip:,}")
+
+        slots = asyncio.Semaphore(self.args.concurrency)
+        pending: set[asyncio.Task] = set()
+        # end row of every chunk still in flight; the checkpoint only moves
+        # past a chunk once every chunk before it has been written too
+        in_flight: dict[int, asyncio.Task] = {}
+        done_upto = skip
+
+        async def write(docs: list[dict]):
+            try:
+                await self._insert(docs)
+            finally:
+                slots.release()
+
+        def advance():
+            nonlocal done_upto
+            for end in sorted(in_flight):
+                task = in_flight[end]
+                if not task.done():
+                    break
+                task.result()  # re-raise insert failures
+                del in_flight[end]
+                done_upto = end
+            self.checkpoint.save(source, done_upto, self.ranges[source])
+
+        rows_read = 0
+        chunk: list[dict] = []
+        for row in iter_rows(source, fmt):
+            rows_read += 1
+            if rows_read <= skip:
+                continue
+            chunk.append(row)
+            if len(chunk) < self.args.chunk:
+                continue
+            await self._submit(source, chunk, rows_read, slots, pending, in_flight, write)
+            chunk = []
+            advance()
+            self._report(source, rows_read)
+        if chunk:
+            await self._submit(source, chunk, rows_read, slots, pending, in_flight, write)
+
+        if pending:
+            await asyncio.gather(*pending)
+        advance()
+        self.checkpoint.save(source, rows_read, self.ranges[source], done=True)
+        self._report(source, rows_read, final=True)
+
+    async def _submit(self, source, chunk, end_row, slots, pending, in_flight, write):
+        docs, rejected = validate_chunk(chunk, int(time.time() * 1000))
+        self.rejected += len(rejected)
+        if self.rejects:
+            first_row = end_row - len(chunk) + 1
+            for i, reason in rejected:
+                data = chunk[i].get(INVALID_JSON, chunk[i])
+                self.rejects.write(json.dumps({"row": first_row + i, "reason": reason, "data": data}) + "\n")
+        if docs:
+            self._track_range(source, docs)
+            created = await sensor_registry.ensure({d["sensor_id"] for d in docs})
+            self.sensors_created += len(created)
+
+        # Wait for a free slot, so at most --concurrency chunks are in flight
+        await slots.acquire()
+        task = asyncio.create_task(write(docs))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        in_flight[end_row] = task
+
+    def close(self):
+        if self.rejects:
+            self.rejects.close()
+
+async def main(args):
+    sources = [Path(p) for p in args.files]
+    missing = [str(p) for p in sources + ([Path(args.sensors)] if args.sensors else []) if not p.is_file()]
+    if missing:
+        raise SystemExit(f"File(s) not found: {', '.join(missing)}")
+
+    print("Connecting to MongoDB...")
+    await init_db()
+    importer = None
+    try:
+        if args.sensors:
+            count = await upsert_sensors(load_sensors(Path(args.sensors)))
+            print(f"✓ upserted {count} sensor(s) from {args.sensors}")
+        await sensor_registry.warm()
+        importer = Importer(args)
+        for source in sources:
+            print(f"Importing {source}...")
+            await importer.import_file(source)
+
+        elapsed = time.perf_counter() - importer.started
+        rate = importer.inserted / elapsed if elapsed else 0
+        print(
+            f"✓ {importer.inserted:,} reading(s) inserted in {elapsed:.1f}s ({rate:,.0f} rows/s), "
+            f"{importer.duplicates:,} duplicate(s), {importer.rejected:,} rejected"
+        )
+        if importer.sensors_created:
+            print(f"✓ created {importer.sensors_created} sensor(s)")
+
+        # Covers chunks written by earlier, interrupted runs too (from the checkpoint)
+        min_ts, max_ts = importer.imported_range()
+        if min_ts is None:
+            return
+        if args.skip_derived:
+            print("Skipped derived data; run backfill_latest.py and rebuild_rollups.py when done")
+            return
+        print("Rebuilding sensor_latest...")
+        count = await rebuild_latest()
+        print(f"✓ sensor_latest updated for {count} sensor(s)")
+        print(f"Rebuilding rollups from {min_ts} to {max_ts}...")
+        counts = await rebuild_rollups(min_ts, max_ts + timedelta(milliseconds=1))
+        for name, written in counts.items():
+            print(f"  ✓ {name}: {written} bucket(s)")
+    finally:
+        if importer:
+            importer.close()
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import readings from CSV/NDJSON files")
+    parser.add_argument("files", nargs="+", help="CSV or NDJSON files to import")
+    parser.add_argument("--format", choices=["auto", "csv", "ndjson"], default="auto", help="Input format (default: by file extension)")
+    parser.add_argument("--chunk", type=int, default=5000, help="Rows per insert_many batch (default: 5000)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches in flight at once (default: 4)")
+    parser.add_argument("--checkpoint", default="airiq_import.checkpoint.json", help="Progress file used to resume (default: airiq_import.checkpoint.json)")
+    parser.add_argument("--sensors", help="JSON array or NDJSON file of sensor metadata to upsert first")
+    parser.add_argument("--rejects", help="Append rejected rows with the reason to this NDJSON file")
+    parser.add_argument("--progress", type=float, default=2.0, help="Seconds between progress lines (default: 2)")
+    parser.add_argument("--skip-derived", action="store_true", help="Don't rebuild sensor_latest and rollups afterwards")
+    args = parser.parse_args()
+    if args.chunk < 1 or args.concurrency < 1:
+        parser.error("--chunk and --concurrency must be at least 1")
+    asyncio.run(main(args))
@@ -4,12 +4,20 @@ Handles the MongoDB database connection.
 Uses MongoDB with Beanie ODM.
 
 Initializes database connection and document models.
+
+PyMongo command and connection pool listeners feed the /metrics endpoint
+(services/metrics.py).
+
+close_db() drains the ingest write-behind buffer before closing the client,
+so queued readings are never lost on a clean shutdown.
 '''
 
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
-from .models import Sensor, Reading
+from .models import Sensor, Reading, SensorLatest, ReadingHourly, ReadingDaily
+from .services.metrics import MongoCommandMetrics, MongoPoolMetrics
+from .services.write_buffer import write_buffer
 
 # MongoDB connection string from environment
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
@@ -21,14 +29,18 @@ client: AsyncIOMotorClient | None = None
 async def init_db():
     """Initialize MongoDB connection and Beanie"""
     global client
-    client = AsyncIOMotorClient(MONGODB_URL)
+    client = AsyncIOMotorClient(
+        MONGODB_URL,
+        event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+    )
     await init_beanie(
         database=client[DATABASE_NAME],
-        document_models=[Sensor, Reading]
+        document_models=[Sensor, Reading, SensorLatest, ReadingHourly, ReadingDaily]
     )
 
 async def close_db():
-    """Close MongoDB connection"""
+    """Flush queued readings, then close MongoDB connection"""
     global client
+    await write_buffer.stop()
     if client:
         client.close()
@@ -7,7 +7,7 @@ Initializes MongoDB connection.
 
 Configures CORS (so frontend can call APIs).
 
-Adds /health endpoint.
+Adds /health and /metrics (Prometheus text format) endpoints.
 
 Includes all routers:
 
@@ -19,6 +19,8 @@ Includes all routers:
 
 /api/v1/readings
 
+/api/v1/stream
+
 Start the server with:
 
 uvicorn app.main:app --reload
@@ -28,22 +30,37 @@ import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from dotenv import load_dotenv
 
-from .db import init_db, close_db
-from .routes import ingest, sensors, map_latest, readings
-
+# Load .env before the app modules read their settings at import time
 load_dotenv()
 
+from .db import init_db, close_db
+from .middleware import MetricsMiddleware, ProfilingMiddleware, ServerTimingMiddleware
+from .services.cache import response_cache
+from .services.devices import device_registry
+from .services.metrics import CONTENT_TYPE, ingest_queue_depth, registry
+from .services.pubsub import broker
+from .services.sensor_registry import sensor_registry
+from .services.write_buffer import write_buffer
+from .routes import ingest, sensors, map_latest, readings, stream
+
 API_V1_PREFIX = os.getenv("API_V1_PREFIX", "/api/v1")
 CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",")]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize MongoDB
+    # Startup: Load device keys once (DEVICE_API_KEYS / DEVICE_KEYS_FILE)
+    device_registry.load()
+    # Initialize MongoDB
     await init_db()
+    # Load known sensor IDs so ingest can skip the per-reading lookup
+    await sensor_registry.warm()
+    # Start the write-behind flusher (no-op unless INGEST_WRITE_BEHIND=1)
+    await write_buffer.start()
     yield
-    # Shutdown: Close MongoDB connection
+    # Shutdown: Flush queued readings and close MongoDB connection
     await close_db()
 
 app = FastAPI(
@@ -59,11 +76,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so every request (including CORS preflights) is counted
+app.add_middleware(MetricsMiddleware, api=app)
+
+ingest_queue_depth.set_function(write_buffer.depth)
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "database": "mongodb"}
+    return {
+        "status": "ok",
+        "database": "mongodb",
+        "sensor_registry": sensor_registry.stats(),
+        "response_cache": response_cache.stats(),
+        "stream": broker.stats(),
+        "ingest_buffer": write_buffer.stats(),
+        "devices": device_registry.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
 
 app.include_router(ingest.router, prefix=API_V1_PREFIX)
 app.include_router(sensors.router, prefix=API_V1_PREFIX)
 app.include_router(map_latest.router, prefix=API_V1_PREFIX)
 app.include_router(readings.router, prefix=API_V1_PREFIX)
+app.include_router(stream.router, prefix=API_V1_PREFIX)
@@ -0,0 +1,144 @@
+'''
+Pure ASGI middleware (no BaseHTTPMiddleware, so streaming responses such as
+/readings/export and /stream pass through untouched).
+
+MetricsMiddleware records, per HTTP request, the in-flight gauge, the
+latency histogram and the request counter in services/metrics.py. Requests
+are labelled with the route template ("/api/v1/sensors/{sensor_id}") or
+"unmatched", never the raw path, so the number of series stays bounded.
+
+ServerTimingMiddleware adds a Server-Timing header with the phases a route
+recorded (services/timing.py), e.g. "query;dur=12.40, transform;dur=8.10".
+
+ProfilingMiddleware answers a request carrying ?profile=1 and a valid
+X-Admin-Key header with the folded stack samples taken while it ran
+(services/profiler.py) instead of the normal body.
+'''
+
+import hmac
+import re
+import time
+from urllib.parse import parse_qs
+from .services import timing
+from .services.metrics import http_duration, http_in_flight, http_requests
+from .services.profiler import ADMIN_API_KEY, start_sampler
+
+def _template_regex(template: str) -> re.Pattern:
+    parts = re.split(r"(\{[^}]+\})", template)
+    return re.compile("".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts) + "$")
+
+class MetricsMiddleware:
+    def __init__(self, app, api):
+        self.app = app
+        self.api = api
+        self._templates: list[tuple[re.Pattern, str]] | None = None
+
+    def _route(self, path: str) -> str:
+        if self._templates is None:
+            # Built on first use, once every router is included. The OpenAPI
+            # paths carry the router prefixes; plain routes cover the rest
+            templates = set(self.api.openapi()["paths"])
+            templates.update(r.path for r in self.api.routes if isinstance(getattr(r, "path", None), str))
+            # Static paths win over templated ones ("/readings/page" before "/readings/{id}")
+            ordered = sorted(templates, key=lambda t: (t.count("{"), -len(t)))
+            self._templates = [(_template_regex(t), t) for t in ordered]
+        for pattern, template in self._templates:
+            if pattern.match(path):
+                return template
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope["path"])
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method, route)
+            http_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, status)
+
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = timing.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"server-timing", timings.header().encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, scope) -> bool:
+        params = parse_qs(scope.get("query_string", b"").decode())
+        return params.get("profile", ["0"])[-1] in ("1", "true")
+
+    def _authorized(self, scope) -> bool:
+        if not ADMIN_API_KEY:
+            return False
+        key = dict(scope["headers"]).get(b"x-admin-key", b"").decode()
+        return hmac.compare_digest(key, ADMIN_API_KEY)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._authorized(scope):
+            await _plain_response(send, 403, b"Profiling requires a valid X-Admin-Key\n")
+            return
+
+        status = 500
+        headers = []
+
+        async def capture(message):
+            # The real response is discarded; only its status and timing survive
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() == b"server-timing"]
+
+        sampler = start_sampler()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            folded = sampler.stop()
+        extra = [(b"x-profiled-status", str(status).encode()), *headers]
+        await _plain_response(send, 200, folded.encode(), extra)
+
+async def _plain_response(send, status: int, body: bytes, headers: list = ()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -18,16 +18,52 @@ ts	       Timestamp of the reading
 pm25, pm10, co2, no2, temp_c, rh	Measured values
 battery	Battery percentage
 firmware	Version string
-raw_json	Original JSON payload
+stats	Optional per-metric {mean, min, max, p95, n} when the device
+	aggregates high-rate samples (the metric fields then hold the mean)
+raw_json	Original JSON payload (READINGS_RAW_JSON: full, extra = only
+	keys Reading has no field for, none = not stored). Unknown keys
+	are dropped at ingest unless listed in READINGS_EXTRA_KEYS
+
+SensorLatest
+Field	     Description
+id	         Sensor.id (one row per sensor)
+ts	       Timestamp of the newest reading
+pm25 ... firmware	Values copied from that reading
+
+ReadingHourly / ReadingDaily (collections readings_1h / readings_1d)
+Field	     Description
+sensor_id	Reference to Sensor.id
+ts	       Start of the hour / UTC day
+pm25 ... rh	{sum, count, min, max} of the readings in that bucket
+
+ReadingView is a projection of Reading without raw_json; read paths fetch
+it instead of the full document.
 
 Every Sensor can have many Readings.
+The rollups are updated incrementally by ingest and can be rebuilt with
+rebuild_rollups.py.
+SensorLatest is maintained by ingest and only ever moves forward in time.
+
+With READINGS_TIMESERIES=1 a new readings collection is created as a MongoDB
+time-series collection (timeField ts, metaField sensor_id, granularity from
+READINGS_TIMESERIES_GRANULARITY). Existing data is moved over with
+migrate_timeseries.py; both layouts are queried the same way.
 '''
 
-from beanie import Document
-from pydantic import Field
+import os
+from beanie import Document, Granularity, PydanticObjectId, TimeSeriesConfig
+from pydantic import BaseModel, Field
+from pymongo import IndexModel
 from datetime import datetime
 from typing import Optional
 
+# What to keep of the original ingest payload: full, extra or none
+READINGS_RAW_JSON = os.getenv("READINGS_RAW_JSON", "full").lower()
+# Payload keys without a field of their own that ingest keeps (comma-separated)
+READINGS_EXTRA_KEYS = frozenset(k.strip() for k in os.getenv("READINGS_EXTRA_KEYS", "").split(",") if k.strip())
+READINGS_TIMESERIES = os.getenv("READINGS_TIMESERIES", "0").lower() in ("1", "true", "yes")
+READINGS_TIMESERIES_GRANULARITY = Granularity(os.getenv("READINGS_TIMESERIES_GRANULARITY", "minutes"))
+
 class Sensor(Document):
     """Sensor document model"""
     id: str = Field(..., description="Unique sensor ID (e.g., 'RPI-ENG-HALL-01')")
@@ -45,6 +81,14 @@ class Sensor(Document):
             "id",  # Index on sensor ID
         ]
 
+class MetricStats(BaseModel):
+    """Summary of the samples a device took for one metric within a report"""
+    mean: float
+    min: float
+    max: float
+    p95: float
+    n: int = Field(..., ge=1, description="Number of samples")
+
 class Reading(Document):
     """Reading document model"""
     sensor_id: str = Field(..., description="Reference to Sensor.id")
@@ -57,12 +101,103 @@ class Reading(Document):
     rh: Optional[float] = None
     battery: Optional[float] = None
     firmware: Optional[str] = None
+    stats: Optional[dict[str, MetricStats]] = None
     raw_json: Optional[dict] = None
 
     class Settings:
         name = "readings"  # Collection name
+        if READINGS_TIMESERIES:
+            # Documents are bucketed per sensor and compressed by MongoDB;
+            # one meta + time index serves every range query
+            timeseries = TimeSeriesConfig(
+                time_field="ts",
+                meta_field="sensor_id",
+                granularity=READINGS_TIMESERIES_GRANULARITY,
+            )
+            indexes = [
+                [("sensor_id", 1), ("ts", -1)],
+                # Cursor paging across all sensors sorts on (ts, _id)
+                [("ts", -1), ("_id", -1)],
+            ]
+        else:
+            indexes = [
+                "sensor_id",  # Index on sensor_id for fast lookups
+                # Time-based queries; _id breaks ties when paging across all sensors
+                [("ts", -1), ("_id", -1)],
+                # Compound index for sensor + time queries; _id breaks ties for cursor paging
+                [("sensor_id", 1), ("ts", -1), ("_id", -1)],
+            ]
+
+class ReadingView(BaseModel):
+    """The fields read endpoints return (no raw_json), for Beanie .project()"""
+    id: Optional[PydanticObjectId] = Field(None, alias="_id")
+    sensor_id: str
+    ts: datetime
+    pm25: Optional[float] = None
+    pm10: Optional[float] = None
+    co2: Optional[float] = None
+    no2: Optional[float] = None
+    temp_c: Optional[float] = None
+    rh: Optional[float] = None
+    battery: Optional[float] = None
+    firmware: Optional[str] = None
+    stats: Optional[dict[str, MetricStats]] = None
+
+    model_config = {"populate_by_name": True}
+
+# Raw MongoDB projection matching ReadingView
+READING_VIEW_PROJECTION = {name: 1 for name in ReadingView.model_fields if name != "id"}
+
+class SensorLatest(Document):
+    """Newest reading per sensor, kept up to date by ingest"""
+    id: str = Field(..., description="Sensor.id this row belongs to")
+    ts: datetime = Field(..., description="Timestamp of the newest reading")
+    pm25: Optional[float] = None
+    pm10: Optional[float] = None
+    co2: Optional[float] = None
+    no2: Optional[float] = None
+    temp_c: Optional[float] = None
+    rh: Optional[float] = None
+    battery: Optional[float] = None
+    firmware: Optional[str] = None
+
+    class Settings:
+        name = "sensor_latest"  # Collection name
+
+class RollupStats(BaseModel):
+    """Running aggregate of one metric within a rollup bucket"""
+    sum: float = 0
+    count: int = 0
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class RollupFields(BaseModel):
+    """Fields shared by the hourly and daily rollup documents"""
+    sensor_id: str = Field(..., description="Reference to Sensor.id")
+    ts: datetime = Field(..., description="Bucket start")
+    pm25: Optional[RollupStats] = None
+    pm10: Optional[RollupStats] = None
+    co2: Optional[RollupStats] = None
+    no2: Optional[RollupStats] = None
+    temp_c: Optional[RollupStats] = None
+    rh: Optional[RollupStats] = None
+
+class ReadingHourly(Document, RollupFields):
+    """Hourly rollup of readings"""
+
+    class Settings:
+        name = "readings_1h"  # Collection name
+        indexes = [
+            IndexModel([("sensor_id", 1), ("ts", 1)], unique=True),  # One bucket per sensor/hour
+            "ts",
+        ]
+
+class ReadingDaily(Document, RollupFields):
+    """Daily (UTC) rollup of readings"""
+
+    class Settings:
+        name = "readings_1d"  # Collection name
         indexes = [
-            "sensor_id",  # Index on sensor_id for fast lookups
-            "ts",  # Index on timestamp for time-based queries
-            [("sensor_id", 1), ("ts", -1)],  # Compound index for sensor + time queries
+            IndexModel([("sensor_id", 1), ("ts", 1)], unique=True),  # One bucket per sensor/day
+            "ts",
         ]
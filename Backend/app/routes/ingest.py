@@ -5,48 +5,83 @@ Flow:
 Checks the API key in header:
 Authorization: Bearer pi-key-1
 
+Keys come from the device registry (services/devices.py). A key bound to
+sensors gets 403 for any other sensor_id, and each key is rate limited
+(429 with Retry-After) before the request reaches MongoDB.
+
 Validates JSON body using IngestPayload.
 
-Creates a new Sensor if it doesn't exist.
+Creates a new Sensor if it doesn't exist (checked against the in-memory
+sensor registry, so known sensors cost no extra query).
+
+Inserts a new Reading record, updates the sensor's row in sensor_latest and
+folds the reading into the hourly/daily rollups. Cached /map/latest (and
+/sensors, when a sensor was created) responses are invalidated, and the
+reading is published to live /stream subscribers (services/writer.py).
+
+With INGEST_WRITE_BEHIND=1 readings are queued and written in batches by a
+background task instead (services/write_buffer.py); responses then include
+"queued": true, and a full queue answers 503 with Retry-After.
 
-Inserts a new Reading record.
+Returns { "ok": true, "sensor_id": "..." }
 
-Returns { "ok": true, "sensor_id": "..." }"""
+POST /api/v1/ingest/batch accepts many payloads at once, either as a JSON
+array or as NDJSON (Content-Type: application/x-ndjson, one payload per line).
+Every distinct sensor is upserted once and all readings are written with a
+single unordered insert_many. The response carries one result per item, so a
+bad row is reported without rejecting the rest of the batch."""
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from pydantic import ValidationError
 from ..schemas import IngestPayload
-from ..models import Reading, Sensor
-from ..services.aqi import pm25_to_aqi
+from ..models import READINGS_RAW_JSON, Reading
+from ..services.aqi import aqi_columns, pm25_to_aqi
+from ..services.cache import SENSORS, response_cache
+from ..services.devices import Device, device_registry
+from ..services.sensor_registry import sensor_registry
+from ..services.write_buffer import INGEST_RETRY_AFTER, BufferFull, write_buffer
+from ..services.writer import after_store, store_readings
+from typing import Optional
+import json
+import math
 import os
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
-def require_device_key(authorization: str = Header(default="")):
-    keys = {k.strip() for k in os.getenv("DEVICE_API_KEYS", "").split(",") if k.strip()}
+# Upper bound on items accepted by /ingest/batch in one request
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "5000"))
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+def require_device_key(authorization: str = Header(default="")) -> Device:
     try:
         scheme, token = authorization.split(" ", 1)
     except ValueError:
         scheme, token = "", ""
-    if scheme.lower() != "bearer" or token not in keys:
+    device = device_registry.lookup(token) if scheme.lower() == "bearer" else None
+    if device is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid device key")
-    return True
-
-@router.post("")
-async def ingest(payload: IngestPayload, _: bool = Depends(require_device_key)):
-    # Upsert sensor if missing
-    sensor = await Sensor.get(payload.sensor_id)
-    if not sensor:
-        sensor = Sensor(
-            id=payload.sensor_id,
-            status="active"
+    wait = device_registry.throttle(token)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests for this device key",
+            headers={"Retry-After": str(math.ceil(wait))},
         )
-        await sensor.insert()
-    
-    # Calculate AQI from PM2.5 value
-    aqi_value, aqi_category = pm25_to_aqi(payload.pm25)
-    
-    # Create reading with calculated AQI
-    reading = Reading(
+    return device
+
+def _raw_json(payload: IngestPayload) -> Optional[dict]:
+    """The copy of the payload kept on the reading (READINGS_RAW_JSON)"""
+    if READINGS_RAW_JSON == "none":
+        return None
+    if READINGS_RAW_JSON == "extra":
+        # Only what the typed fields do not already hold
+        return payload.model_extra or None
+    return payload.model_dump()
+
+def build_reading(payload: IngestPayload) -> Reading:
+    """Map a validated payload onto a Reading document"""
+    return Reading(
         sensor_id=payload.sensor_id,
         ts=payload.ts,
         pm25=payload.pm25,
@@ -57,10 +92,13 @@ async def ingest(payload: IngestPayload, _: bool = Depends(require_device_key)):
         rh=payload.rh,
         battery=payload.battery,
         firmware=payload.firmware,
-        raw_json=payload.model_dump(),
+        stats=payload.stats,
+        raw_json=_raw_json(payload),
     )
-    await reading.insert()
-    
+
+def ingest_result(payload: IngestPayload, aqi: tuple | None = None) -> dict:
+    """Response body for one stored payload; aqi is (value, category) if already computed"""
+    aqi_value, aqi_category = aqi if aqi is not None else pm25_to_aqi(payload.pm25)
     return {
         "ok": True,
         "sensor_id": payload.sensor_id,
@@ -68,3 +106,136 @@ async def ingest(payload: IngestPayload, _: bool = Depends(require_device_key)):
         "aqi_category": aqi_category,
         "timestamp": payload.ts.isoformat() if hasattr(payload.ts, 'isoformat') else str(payload.ts)
     }
+
+def _enqueue(readings: list[Reading]):
+    """Hand readings to the write-behind buffer, or 503 when it is full"""
+    try:
+        write_buffer.put_many(readings)
+    except BufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest buffer is full, retry later",
+            headers={"Retry-After": str(INGEST_RETRY_AFTER)},
+        )
+
+def _error_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'body'}: {err['msg']}" for err in exc.errors()
+    )
+
+async def _read_batch_items(request: Request) -> list:
+    """Decode the batch body into a list of raw items (JSON array or NDJSON)"""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                # Keep the slot so result indexes still match input lines
+                items.append(e)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of payloads")
+
+    if len(items) > INGEST_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {INGEST_BATCH_MAX} items"
+        )
+    return items
+
+@router.post("")
+async def ingest(payload: IngestPayload, device: Device = Depends(require_device_key)):
+    if not device.allows(payload.sensor_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Key is not allowed to post for this sensor")
+
+    # Upsert sensor if missing
+    if await sensor_registry.ensure([payload.sensor_id]):
+        response_cache.invalidate(SENSORS)
+    
+    # Create reading and store it (or queue it in write-behind mode)
+    reading = build_reading(payload)
+    if write_buffer.enabled:
+        _enqueue([reading])
+        return {**ingest_result(payload), "queued": True}
+    await reading.insert()
+    await after_store([reading])
+    
+    # Respond with AQI calculated from the PM2.5 value
+    return ingest_result(payload)
+
+@router.post(
+    "/batch",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/IngestPayload"}}
+                },
+                "application/x-ndjson": {
+                    "schema": {"$ref": "#/components/schemas/IngestPayload"}
+                },
+            },
+        }
+    },
+)
+async def ingest_batch(request: Request, device: Device = Depends(require_device_key)):
+    items = await _read_batch_items(request)
+
+    # Validate everything in one pass, remembering which input each payload came from
+    results: list[dict] = [{} for _ in items]
+    payloads: list[tuple[int, IngestPayload]] = []
+    for i, item in enumerate(items):
+        if isinstance(item, Exception):
+            results[i] = {"index": i, "ok": False, "error": f"Invalid JSON: {item}"}
+            continue
+        try:
+            payload = IngestPayload.model_validate(item)
+        except ValidationError as e:
+            results[i] = {"index": i, "ok": False, "error": _error_message(e)}
+            continue
+        if not device.allows(payload.sensor_id):
+            results[i] = {"index": i, "ok": False, "error": "Key is not allowed to post for this sensor"}
+            continue
+        payloads.append((i, payload))
+
+    # Upsert every distinct sensor once
+    if await sensor_registry.ensure({p.sensor_id for _, p in payloads}):
+        response_cache.invalidate(SENSORS)
+
+    # Single unordered bulk insert; failures are reported per item
+    failed: dict[int, str] = {}
+    readings = [build_reading(p) for _, p in payloads]
+    queued = write_buffer.enabled
+    if queued:
+        _enqueue(readings)
+    else:
+        failed = await store_readings(readings)
+
+    # AQI for the whole batch in one vectorised call
+    aqi = aqi_columns([p.pm25 for _, p in payloads])
+    for n, (i, payload) in enumerate(payloads):
+        if n in failed:
+            results[i] = {"index": i, "ok": False, "sensor_id": payload.sensor_id, "error": failed[n]}
+            continue
+        results[i] = {"index": i, **ingest_result(payload, (aqi["aqi_pm25"][n], aqi["aqi_category"][n]))}
+        if queued:
+            results[i]["queued"] = True
+
+    accepted = sum(1 for r in results if r["ok"])
+    return {
+        "ok": accepted == len(results),
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+    }
@@ -7,59 +7,99 @@ Returns one object per sensor:
   "sensor_id": "RPI-ENG-HALL-01",
   "ts": "2025-10-12T18:00:00Z",
   "pm25": 12.5,
-  "aqi_pm25": 50,
-  "aqi_category": "Good",
+  "aqi_pm25": 57,
+  "aqi_category": "Moderate",
   "lat": 32.7313,
   "lon": -97.1106,
   "location_label": "Engineering Hall Lobby"
 }
 
 The frontend plots pins using lat/lon and colors them by AQI.
+
+Rows come from the sensor_latest collection (kept current by ingest) joined
+with sensor metadata in a single aggregation. Run backfill_latest.py once to
+build it from existing readings.
+
+Responses are cached for CACHE_TTL_MAP_LATEST seconds (default 5) and
+concurrent misses share one query; sensor updates invalidate it and ingest
+marks it stale, so it is refreshed at most every CACHE_MIN_REFRESH_MAP_LATEST
+seconds (default 1) while readings arrive.
+The cache holds the encoded body with its ETag (a hash of the bytes, so
+moving a sensor changes it too), and polls with If-None-Match get a 304 when
+nothing changed.
 '''
 
-from fastapi import APIRouter
-from ..models import Reading, Sensor
-from ..services.aqi import pm25_to_aqi
+from fastapi import APIRouter, Request
+from ..models import Sensor, SensorLatest
+from ..services.aqi import aqi_columns
+from ..services.cache import MAP_LATEST, response_cache
+from ..services.conditional import CachedBody, encode_json, respond
+import os
 
 router = APIRouter(prefix="/map", tags=["map"])
 
+CACHE_TTL_MAP_LATEST = float(os.getenv("CACHE_TTL_MAP_LATEST", "5"))
+
+MAP_FIELDS = ("ts", "pm25", "pm10", "co2", "no2", "temp_c", "rh")
+
 @router.get("/latest")
-async def map_latest():
-    # Get all sensors
-    sensors = await Sensor.find_all().to_list()
+async def map_latest(request: Request):
+    cached = await response_cache.get_or_compute(MAP_LATEST, CACHE_TTL_MAP_LATEST, _load_map_latest)
+    return respond(request, cached)
+
+async def _load_map_latest() -> CachedBody:
+    # Latest row per sensor joined with its metadata, in one query
+    pipeline = [
+        {"$lookup": {
+            "from": Sensor.get_settings().name,
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "sensor",
+        }},
+        {"$unwind": "$sensor"},
+        # Only the fields the map shows
+        {"$project": {
+            **{f: 1 for f in MAP_FIELDS},
+            "sensor.lat": 1,
+            "sensor.lon": 1,
+            "sensor.location_label": 1,
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    rows = await SensorLatest.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    
+    # AQI for every sensor in one vectorized call
+    aqi = aqi_columns(
+        [row.get("pm25") for row in rows],
+        [row.get("pm10") for row in rows],
+        [row.get("no2") for row in rows],
+        [row.get("co2") for row in rows],
+    )
     
     out = []
-    for sensor in sensors:
-        # Get latest reading for this sensor
-        readings = await Reading.find(
-            Reading.sensor_id == sensor.id
-        ).sort("-ts").limit(1).to_list()
+    for i, row in enumerate(rows):
+        sensor = row["sensor"]
+        # Handle datetime serialization
+        ts = row.get("ts")
+        ts_str = ts if isinstance(ts, str) or ts is None else ts.isoformat()
         
-        if readings:
-            reading = readings[0]
-            aqi, cat = pm25_to_aqi(reading.pm25)
-            # Handle datetime serialization
-            ts_str = None
-            if reading.ts:
-                if isinstance(reading.ts, str):
-                    ts_str = reading.ts
-                else:
-                    ts_str = reading.ts.isoformat()
-            
-            out.append({
-                "sensor_id": reading.sensor_id,
-                "ts": ts_str,
-                "pm25": reading.pm25,
-                "pm10": reading.pm10,
-                "co2": reading.co2,
-                "no2": reading.no2,
-                "temp_c": reading.temp_c,
-                "rh": reading.rh,
-                "aqi_pm25": aqi,
-                "aqi_category": cat,
-                "lat": sensor.lat,
-                "lon": sensor.lon,
-                "location_label": sensor.location_label
-            })
+        out.append({
+            "sensor_id": row["_id"],
+            "ts": ts_str,
+            "pm25": row.get("pm25"),
+            "pm10": row.get("pm10"),
+            "co2": row.get("co2"),
+            "no2": row.get("no2"),
+            "temp_c": row.get("temp_c"),
+            "rh": row.get("rh"),
+            "aqi_pm25": aqi["aqi_pm25"][i],
+            "aqi_category": aqi["aqi_category"][i],
+            "aqi_pm10": aqi["aqi_pm10"][i],
+            "aqi_no2": aqi["aqi_no2"][i],
+            "aqi_co2": aqi["aqi_co2"][i],
+            "lat": sensor.get("lat"),
+            "lon": sensor.get("lon"),
+            "location_label": sensor.get("location_label")
+        })
     
-    return out
+    return encode_json(out)
@@ -8,50 +8,355 @@ sensor_id	filter by sensor
 start	ISO datetime (inclusive)
 end	ISO datetime (inclusive)
 limit	max number of rows (default 5000, max 20000)
+format	json, columnar, msgpack or arrow (overrides the Accept header)
+
+The response format is negotiated from the Accept header: application/json
+(rows, default), application/vnd.airiq.columnar+json (one array per field),
+application/msgpack or application/vnd.apache.arrow.stream. Every format,
+JSON rows included, is built straight from the MongoDB documents without
+per-row models; JSON is encoded with orjson. The OpenAPI schema still
+documents the rows as ReadingOut.
+
+Responses carry an ETag derived from a cheap probe (row count and newest ts
+for the filter); a matching If-None-Match gets 304 Not Modified before the
+real query runs.
+
+The Server-Timing header breaks the time down into validate (the probe),
+archive, query (MongoDB round trips), transform (AQI scoring and output
+rows) and serialize (encoding the body). Only the fields ReadingView
+describes are fetched, never raw_json.
+
+Readings moved to the Parquet archive by archive_readings.py are merged back
+in when a range starts before the archive cutoff (services/archive.py), so
+callers see one continuous history. The other endpoints below read MongoDB
+only; /aggregate still covers archived time through the rollups.
+
+GET /api/v1/readings/aggregate returns time buckets instead of raw rows:
+
+Parameter	Description
+sensor_id	filter by sensor
+start / end	ISO datetime range (defaults to the last 24 hours)
+bucket	5m, 15m, 1h, 6h or 1d
+stats	comma separated: avg,min,max,count (default avg)
+metrics	comma separated metric names (default all)
+tz_offset	minutes east of UTC used to align buckets (e.g. local midnight)
+
+Each row looks like {"ts": "...", "pm25_avg": 12.1, "co2_max": 810, ...}.
+Buckets of an hour or more are served from the readings_1h / readings_1d
+rollups (the coarsest one that tiles the bucket) instead of raw readings;
+there, start/end select rollup buckets by their start time.
+
+GET /api/v1/readings/export streams every reading in the range (no row cap)
+as NDJSON (format=ndjson, default) or CSV (format=csv). Rows are read from
+the MongoDB cursor in batches and written as they arrive, so memory use stays
+flat regardless of the size of the range.
+
+GET /api/v1/readings/page pages through history with an opaque cursor:
+
+Parameter	Description
+sensor_id / start / end	same filters as above
+order	asc (default) or desc
+limit	page size (default 1000, max 20000)
+cursor	next_cursor from the previous page
+
+The cursor encodes the (ts, _id) of the last row, so each page is an index
+seek on (sensor_id, ts, _id), or on (ts, _id) without sensor_id, instead of
+a skip, and stays fast however far back a client reads. next_cursor is null on the last page.
 '''
 
-from fastapi import APIRouter, Query
-from datetime import datetime
-from ..models import Reading
-from ..schemas import ReadingOut
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta, timezone
+from ..models import READING_VIEW_PROJECTION, Reading
+from ..schemas import ReadingOut, ReadingPage
+from ..services import formats
+from ..services.aqi import aqi_columns
+from ..services.archive import archive
+from ..services.timing import phase
+from ..services.conditional import is_not_modified, make_etag, not_modified, validator_headers
+from ..services.aggregation import BUCKETS, METRICS, STATS, bucket_pipeline, bucket_rows
+from ..services.rollups import pick_rollup
+from typing import AsyncIterator, Literal, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import json
+import os
 
 router = APIRouter(prefix="/readings", tags=["readings"])
 
-@router.get("", response_model=list[ReadingOut])
+# Rows fetched per cursor batch (and written per chunk) by /readings/export
+EXPORT_BATCH_SIZE = int(os.getenv("READINGS_EXPORT_BATCH", "2000"))
+
+def _utc(ts: datetime) -> datetime:
+    # MongoDB stores UTC; naive query datetimes are treated as UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+def _range_filter(sensor_id: Optional[str], start: Optional[datetime], end: Optional[datetime]) -> dict:
+    """Raw MongoDB filter for a sensor and inclusive time range"""
+    query: dict = {}
+    if sensor_id:
+        query["sensor_id"] = sensor_id
+    if start or end:
+        query["ts"] = {}
+        if start:
+            query["ts"]["$gte"] = _utc(start)
+        if end:
+            query["ts"]["$lte"] = _utc(end)
+    return query
+
+async def _range_validator(query: dict, *params) -> str:
+    """ETag for a filter, from index-only count and max(ts)"""
+    collection = Reading.get_motor_collection()
+    count = await collection.count_documents(query)
+    newest = await collection.find_one(query, projection={"_id": 0, "ts": 1}, sort=[("ts", -1)])
+    newest_ts = newest["ts"] if newest else None
+    return make_etag(count, newest_ts, *params)
+
+def _merge_cold(cold: list[dict], hot: list, limit: int, id_of, ts_of) -> list:
+    """Archived rows plus hot rows in ts order; a row in both places is taken from MongoDB"""
+    hot_ids = {str(id_of(r)) for r in hot}
+    merged = [r for r in cold if str(id_of(r)) not in hot_ids] + hot
+    merged.sort(key=ts_of)
+    return merged[:limit]
+
+@router.get(
+    "",
+    response_model=list[ReadingOut],
+    responses={
+        200: {"content": {formats.MEDIA_TYPES[f]: {} for f in formats.ENCODERS}},
+        304: {"description": "Not modified since the client's cached copy"},
+        406: {"description": "Requested format is not available on this server"},
+    },
+)
 async def time_range(
+    request: Request,
     sensor_id: Optional[str] = Query(None, description="Filter by sensor id"),
     start: Optional[datetime] = Query(None, description="ISO8601 start (inclusive)"),
     end: Optional[datetime] = Query(None, description="ISO8601 end (inclusive)"),
-    limit: int = Query(5000, ge=1, le=20000, description="Max rows")
+    limit: int = Query(5000, ge=1, le=20000, description="Max rows"),
+    format: Optional[Literal["json", "columnar", "msgpack", "arrow"]] = Query(
+        None, description="Response format (overrides the Accept header)"
+    ),
 ):
-    # Build query using Beanie's query builder
-    find_query = Reading.find()
+    fmt = format or formats.negotiate(request.headers.get("accept"))
+    query = _range_filter(sensor_id, start, end)
     
-    # Apply filters
-    if sensor_id:
-        find_query = find_query.find(Reading.sensor_id == sensor_id)
+    # Answer unchanged polls before touching the data
+    with phase("validate"):
+        etag = await _range_validator(query, limit, fmt, archive.version())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    headers = {**validator_headers(etag), "Vary": "Accept"}
     
-    if start:
-        find_query = find_query.find(Reading.ts >= start)
+    # Rows older than the archive cutoff come from Parquet (empty for hot ranges)
+    cold = []
+    if archive.covers(start):
+        with phase("archive"):
+            cold = await asyncio.to_thread(archive.read, sensor_id, start, end, limit)
     
-    if end:
-        find_query = find_query.find(Reading.ts <= end)
+    if fmt != formats.JSON:
+        cursor = Reading.get_motor_collection().find(
+            query,
+            projection={"_id": int(bool(cold)), **{f: 1 for f in formats.FIELDS}},
+        ).sort("ts", 1).limit(limit)
+        with phase("query"):
+            if cold:
+                hot = await cursor.to_list(limit)
+                columns = formats.rows_to_columns(
+                    _merge_cold(cold, hot, limit, lambda d: d["_id"], lambda d: d["ts"])
+                )
+            else:
+                columns = await formats.collect_columns(cursor)
+        with phase("transform"):
+            columns.update(aqi_columns(columns["pm25"], columns["pm10"], columns["no2"], columns["co2"]))
+        with phase("serialize"):
+            try:
+                content = formats.ENCODERS[fmt](columns)
+            except formats.FormatUnavailable as e:
+                raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=str(e))
+        return Response(content=content, media_type=formats.MEDIA_TYPES[fmt], headers=headers)
+
+    # Raw documents straight to JSON bytes: no Reading or ReadingOut models per row
+    with phase("query"):
+        docs = await Reading.get_motor_collection().find(
+            query, projection=READING_VIEW_PROJECTION
+        ).sort("ts", 1).limit(limit).to_list(limit)
+        if cold:
+            docs = _merge_cold(cold, docs, limit, lambda d: d["_id"], lambda d: d["ts"])
     
-    # Execute query - sort by timestamp ascending, limit results
-    readings = await find_query.sort("+ts").limit(limit).to_list()
+    with phase("transform"):
+        # Score every row in one vectorized call
+        aqi = aqi_columns(
+            [d.get("pm25") for d in docs],
+            [d.get("pm10") for d in docs],
+            [d.get("no2") for d in docs],
+            [d.get("co2") for d in docs],
+        )
+        rows = formats.json_rows(docs, aqi)
     
-    return [
-        ReadingOut(
-            sensor_id=r.sensor_id,
-            ts=r.ts,
-            pm25=r.pm25,
-            pm10=r.pm10,
-            co2=r.co2,
-            no2=r.no2,
-            temp_c=r.temp_c,
-            rh=r.rh,
-            battery=r.battery,
-            firmware=r.firmware
-        ) for r in readings
-    ]
+    with phase("serialize"):
+        content = formats.encode_json_rows(rows)
+    return Response(content=content, media_type=formats.MEDIA_TYPES[formats.JSON], headers=headers)
+
+# Guard against ranges that would produce an unreasonable number of buckets
+MAX_BUCKETS = 20000
+
+def _csv_param(value: Optional[str], allowed: tuple[str, ...], name: str) -> list[str]:
+    if not value:
+        return list(allowed)
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in items if v not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {name}: {', '.join(unknown)} (allowed: {', '.join(allowed)})"
+        )
+    return items
+
+@router.get("/aggregate")
+async def aggregate(
+    sensor_id: Optional[str] = Query(None, description="Filter by sensor id"),
+    start: Optional[datetime] = Query(None, description="ISO8601 start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="ISO8601 end (inclusive)"),
+    bucket: Literal["5m", "15m", "1h", "6h", "1d"] = Query("1h", description="Bucket size"),
+    stats: str = Query("avg", description="Comma separated: avg,min,max,count"),
+    metrics: Optional[str] = Query(None, description="Comma separated metrics (default all)"),
+    tz_offset: int = Query(0, ge=-14 * 60, le=14 * 60, description="Minutes east of UTC for bucket alignment"),
+):
+    stat_list = _csv_param(stats, STATS, "stats")
+    metric_list = _csv_param(metrics, METRICS, "metrics")
+
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    bucket_ms = BUCKETS[bucket]
+    if (end - start).total_seconds() * 1000 / bucket_ms > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range too large for {bucket} buckets (max {MAX_BUCKETS})"
+        )
+
+    match = _range_filter(sensor_id, start, end)
+
+    # Prefer the coarsest rollup over rescanning raw readings
+    rollup = pick_rollup(bucket_ms, tz_offset)
+    source = rollup or Reading
+    pipeline = bucket_pipeline(
+        match, bucket_ms, metric_list, stat_list, tz_offset,
+        source="rollup" if rollup else "raw",
+    )
+    docs = await source.get_motor_collection().aggregate(pipeline).to_list(length=None)
+    return bucket_rows(docs, metric_list, stat_list)
+
+def _iso(ts: datetime) -> str:
+    # MongoDB returns naive UTC datetimes; make the zone explicit in exports
+    return (ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts).isoformat()
+
+async def _ndjson_chunks(cursor) -> AsyncIterator[str]:
+    lines = []
+    async for doc in cursor:
+        doc["ts"] = _iso(doc["ts"])
+        lines.append(json.dumps(doc))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+async def _csv_chunks(cursor) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(formats.FIELDS)
+    rows = 0
+    async for doc in cursor:
+        doc["ts"] = _iso(doc["ts"])
+        writer.writerow([doc.get(f) for f in formats.FIELDS])
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+@router.get("/export")
+async def export(
+    sensor_id: Optional[str] = Query(None, description="Filter by sensor id"),
+    start: Optional[datetime] = Query(None, description="ISO8601 start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="ISO8601 end (inclusive)"),
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Output format"),
+):
+    cursor = Reading.get_motor_collection().find(
+        _range_filter(sensor_id, start, end),
+        projection={"_id": 0, **{f: 1 for f in formats.FIELDS}},
+        batch_size=EXPORT_BATCH_SIZE,
+    ).sort("ts", 1)
+
+    if format == "csv":
+        chunks, media_type = _csv_chunks(cursor), "text/csv"
+    else:
+        chunks, media_type = _ndjson_chunks(cursor), "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="readings.{format}"'},
+    )
+
+def _encode_cursor(ts: datetime, oid: ObjectId) -> str:
+    ms = int((ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts).timestamp() * 1000)
+    return base64.urlsafe_b64encode(f"{ms}:{oid}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ms, oid = raw.split(":", 1)
+        return datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc), ObjectId(oid)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+@router.get("/page", response_model=ReadingPage)
+async def page(
+    sensor_id: Optional[str] = Query(None, description="Filter by sensor id"),
+    start: Optional[datetime] = Query(None, description="ISO8601 start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="ISO8601 end (inclusive)"),
+    order: Literal["asc", "desc"] = Query("asc", description="Sort order by timestamp"),
+    limit: int = Query(1000, ge=1, le=20000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    query = _range_filter(sensor_id, start, end)
+    direction = 1 if order == "asc" else -1
+
+    if cursor:
+        ts, oid = _decode_cursor(cursor)
+        after, ts_bound = ("$gt", "$gte") if direction == 1 else ("$lt", "$lte")
+        # Seek to the last seen ts (it already lies within start/end), then
+        # skip the rows returned at that same ts
+        query.setdefault("ts", {})[ts_bound] = ts
+        query["$or"] = [{"ts": {after: ts}}, {"_id": {after: oid}}]
+
+    docs = await Reading.get_motor_collection().find(
+        query,
+        projection={f: 1 for f in formats.FIELDS},
+    ).sort([("ts", direction), ("_id", direction)]).limit(limit + 1).to_list(length=None)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = _encode_cursor(docs[-1]["ts"], docs[-1]["_id"])
+
+    aqi = aqi_columns(
+        [d.get("pm25") for d in docs],
+        [d.get("pm10") for d in docs],
+        [d.get("no2") for d in docs],
+        [d.get("co2") for d in docs],
+    )
+    return ReadingPage(
+        items=[ReadingOut(**doc, **{k: v[i] for k, v in aqi.items()}) for i, doc in enumerate(docs)],
+        next_cursor=next_cursor,
+    )
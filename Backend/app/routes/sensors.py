@@ -12,14 +12,24 @@ Returns the most recent reading for one sensor, plus AQI info.
 PATCH /api/v1/sensors/{sensor_id}
 
 Allows you to update metadata (name, lat/lon, label, status).
+
+The sensor list is served from a short-lived cache (CACHE_TTL_SENSORS
+seconds, default 30) that updates and newly registered sensors invalidate.
+It carries an ETag, so unchanged polls with If-None-Match get a 304.
 '''
 
-from fastapi import APIRouter, Body, HTTPException, status
-from ..models import Sensor, Reading
+from fastapi import APIRouter, Body, HTTPException, Request, status
+from ..models import Sensor, Reading, ReadingView
 from ..schemas import SensorOut, ReadingOut
-from ..services.aqi import pm25_to_aqi
+from ..services.aqi import aqi_columns
+from ..services.cache import MAP_LATEST, SENSORS, response_cache
+from ..services.conditional import CachedBody, encode_json, respond
+from ..services.sensor_registry import sensor_registry
 from pydantic import BaseModel
 from typing import Optional
+import os
+
+CACHE_TTL_SENSORS = float(os.getenv("CACHE_TTL_SENSORS", "30"))
 
 class SensorUpdate(BaseModel):
     name: Optional[str] = None
@@ -32,22 +42,26 @@ class SensorUpdate(BaseModel):
 router = APIRouter(prefix="/sensors", tags=["sensors"])
 
 @router.get("", response_model=list[SensorOut])
-async def list_sensors():
+async def list_sensors(request: Request):
+    cached = await response_cache.get_or_compute(SENSORS, CACHE_TTL_SENSORS, _load_sensors)
+    return respond(request, cached)
+
+async def _load_sensors() -> CachedBody:
     sensors = await Sensor.find_all().to_list()
-    return sensors
+    return encode_json([SensorOut.model_validate(s).model_dump() for s in sensors])
 
 @router.get("/{sensor_id}/latest", response_model=ReadingOut | None)
 async def latest(sensor_id: str):
     readings = await Reading.find(
         Reading.sensor_id == sensor_id
-    ).sort("-ts").limit(1).to_list()
+    ).sort("-ts").limit(1).project(ReadingView).to_list()
     
     if not readings:
         return None
     
     reading = readings[0]
     
-    aqi, cat = pm25_to_aqi(reading.pm25)
+    aqi = aqi_columns([reading.pm25], [reading.pm10], [reading.no2], [reading.co2])
     return ReadingOut(
         sensor_id=reading.sensor_id,
         ts=reading.ts,
@@ -59,8 +73,12 @@ async def latest(sensor_id: str):
         rh=reading.rh,
         battery=reading.battery,
         firmware=reading.firmware,
-        aqi_pm25=aqi,
-        aqi_category=cat
+        stats=reading.stats,
+        aqi_pm25=aqi["aqi_pm25"][0],
+        aqi_category=aqi["aqi_category"][0],
+        aqi_pm10=aqi["aqi_pm10"][0],
+        aqi_no2=aqi["aqi_no2"][0],
+        aqi_co2=aqi["aqi_co2"][0]
     )
 
 @router.patch("/{sensor_id}", response_model=SensorOut)
@@ -74,4 +92,6 @@ async def update_sensor(sensor_id: str, payload: SensorUpdate = Body(...)):
         setattr(sensor, key, value)
     
     await sensor.save()
+    sensor_registry.invalidate(sensor_id)
+    response_cache.invalidate(SENSORS, MAP_LATEST)
     return sensor
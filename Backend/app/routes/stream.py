@@ -0,0 +1,90 @@
+'''
+Purpose: live push of new readings to dashboards.
+
+GET /api/v1/stream            Server-Sent Events
+WS  /api/v1/stream/ws         WebSocket variant (JSON messages)
+
+Query parameters:
+
+Parameter	Description
+sensor_id	only receive these sensors (repeatable; default all)
+
+Events:
+reading	a stored reading with its AQI fields
+resync	events were dropped because the client fell behind; refetch
+	/map/latest (or /readings) and keep listening
+
+SSE sends a comment line and the WebSocket a {"type": "ping"} message every
+STREAM_HEARTBEAT_SECONDS (default 15) so idle connections stay open.
+'''
+
+from fastapi import APIRouter, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from ..services.pubsub import broker
+from typing import Optional
+import asyncio
+import json
+import os
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+
+@router.get("")
+async def stream_sse(
+    request: Request,
+    sensor_id: Optional[list[str]] = Query(None, description="Only these sensors (repeatable)"),
+):
+    sub = broker.subscribe(sensor_id)
+
+    async def events():
+        try:
+            # Tell EventSource how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            while True:
+                event = await sub.get(STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _until_disconnect(websocket: WebSocket):
+    # Client messages are not used; reading them is how a close is noticed
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/ws")
+async def stream_ws(
+    websocket: WebSocket,
+    sensor_id: Optional[list[str]] = Query(None),
+):
+    # Subscribe before accepting so nothing published after the handshake is missed
+    sub = broker.subscribe(sensor_id)
+    await websocket.accept()
+    closed = asyncio.create_task(_until_disconnect(websocket))
+    try:
+        while not closed.done():
+            getter = asyncio.create_task(sub.get(STREAM_HEARTBEAT_SECONDS))
+            await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            await websocket.send_json(getter.result() or {"type": "ping"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        broker.unsubscribe(sub)
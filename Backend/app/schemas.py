@@ -1,20 +1,28 @@
 '''
 Defines Pydantic models (how data looks coming in or going out):
 
-IngestPayload → expected JSON from the Pi
+IngestPayload → expected JSON from the Pi (stats is set when the Pi
+aggregates high-rate samples; the metric fields then hold the mean).
+Unknown keys are dropped unless listed in READINGS_EXTRA_KEYS; the allowed
+ones are kept in model_extra so raw_json can store just those.
 
 SensorOut → what /sensors returns
 
 ReadingOut → what reading endpoints return (includes AQI fields)
 
+ReadingPage → one page of readings plus the cursor for the next page
+
 Pydantic validates types and converts strings → floats/datetimes automatically.
 '''
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import datetime
 from typing import Optional
+from .models import READINGS_EXTRA_KEYS, MetricStats
 
 class IngestPayload(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
     sensor_id: str = Field(..., example="RPI-ENG-HALL-01")
     ts: datetime
     pm25: Optional[float] = None
@@ -25,6 +33,15 @@ class IngestPayload(BaseModel):
     rh: Optional[float] = None
     battery: Optional[float] = None
     firmware: Optional[str] = None
+    stats: Optional[dict[str, MetricStats]] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _allowed_keys(cls, data):
+        # Devices can send anything; only allowlisted extras reach raw_json
+        if isinstance(data, dict):
+            return {k: v for k, v in data.items() if k in cls.model_fields or k in READINGS_EXTRA_KEYS}
+        return data
 
 class SensorOut(BaseModel):
     id: str
@@ -48,8 +65,16 @@ class ReadingOut(BaseModel):
     rh: float | None = None
     battery: float | None = None
     firmware: str | None = None
+    stats: dict[str, MetricStats] | None = None
     aqi_pm25: int | None = None
     aqi_category: str | None = None
+    aqi_pm10: int | None = None
+    aqi_no2: int | None = None
+    aqi_co2: int | None = None
 
     class Config:
         from_attributes = True
+
+class ReadingPage(BaseModel):
+    items: list[ReadingOut]
+    next_cursor: str | None = None
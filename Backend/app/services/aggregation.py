@@ -0,0 +1,95 @@
+'''
+Builds MongoDB aggregation pipelines that bucket readings by time for charts.
+
+Each bucket keeps sum, count, min and max per metric; avg is derived from
+sum / count at the end. Bucket start is computed arithmetically from the
+epoch milliseconds of ts (date minus the epoch), so it works on any MongoDB
+4.4+ server without $dateTrunc.
+
+The same pipeline runs over raw readings (source="raw") or over the
+readings_1h / readings_1d rollups (source="rollup"), whose documents already
+hold {"sum", "count", "min", "max"} per metric.
+'''
+
+from datetime import datetime, timezone
+
+# Supported bucket sizes in milliseconds
+BUCKETS = {
+    "5m": 5 * 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "6h": 6 * 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+METRICS = ("pm25", "pm10", "co2", "no2", "temp_c", "rh")
+STATS = ("avg", "min", "max", "count")
+
+def bucket_start_expr(bucket_ms: int, tz_offset_minutes: int = 0) -> dict:
+    """Expression for the epoch-ms start of the bucket containing $ts"""
+    offset_ms = tz_offset_minutes * 60 * 1000
+    # Shift into local time so day buckets start at local midnight, then back
+    local_ms = {"$add": [{"$subtract": ["$ts", EPOCH]}, offset_ms]}
+    return {"$subtract": [
+        {"$subtract": [local_ms, {"$mod": [local_ms, bucket_ms]}]},
+        offset_ms,
+    ]}
+
+def metric_accumulators(metrics: list[str], stats: list[str], source: str = "raw") -> dict:
+    """$group accumulators producing <m>_sum/_count/_min/_max for each metric"""
+    group: dict = {}
+    for m in metrics:
+        if source == "rollup":
+            value_sum, value_count = f"${m}.sum", {"$ifNull": [f"${m}.count", 0]}
+            value_min, value_max = f"${m}.min", f"${m}.max"
+        else:
+            value_sum, value_count = f"${m}", {"$cond": [{"$isNumber": f"${m}"}, 1, 0]}
+            value_min = value_max = f"${m}"
+        if "avg" in stats:
+            group[f"{m}_sum"] = {"$sum": value_sum}
+        if "avg" in stats or "count" in stats:
+            group[f"{m}_count"] = {"$sum": value_count}
+        if "min" in stats:
+            group[f"{m}_min"] = {"$min": value_min}
+        if "max" in stats:
+            group[f"{m}_max"] = {"$max": value_max}
+    return group
+
+def bucket_pipeline(
+    match: dict,
+    bucket_ms: int,
+    metrics: list[str],
+    stats: list[str],
+    tz_offset_minutes: int = 0,
+    source: str = "raw",
+) -> list[dict]:
+    """Pipeline that groups documents matching `match` into bucket_ms buckets"""
+    return [
+        # Served by the (sensor_id, ts) compound index
+        {"$match": match},
+        {"$group": {
+            "_id": bucket_start_expr(bucket_ms, tz_offset_minutes),
+            **metric_accumulators(metrics, stats, source),
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+def bucket_rows(docs: list[dict], metrics: list[str], stats: list[str]) -> list[dict]:
+    """Shape grouped documents into {"ts", "<metric>_<stat>", ...} rows"""
+    out = []
+    for doc in docs:
+        row = {"ts": datetime.fromtimestamp(doc["_id"] / 1000, tz=timezone.utc)}
+        for m in metrics:
+            count = doc.get(f"{m}_count", 0)
+            if "avg" in stats:
+                row[f"{m}_avg"] = doc[f"{m}_sum"] / count if count else None
+            if "min" in stats:
+                row[f"{m}_min"] = doc.get(f"{m}_min")
+            if "max" in stats:
+                row[f"{m}_max"] = doc.get(f"{m}_max")
+            if "count" in stats:
+                row[f"{m}_count"] = count
+        out.append(row)
+    return out
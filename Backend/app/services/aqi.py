@@ -1,16 +1,121 @@
-#A simple helper that turns PM2.5 values into AQI numbers and categories:
-#  Minimal PM2.5 AQI mapping (placeholder; replace with full EPA table as needed)
+'''
+AQI engine built on the EPA breakpoint tables.
+
+Concentrations are truncated to the table precision, located in the
+breakpoint table and linearly interpolated:
+
+    I = (I_hi - I_lo) / (C_hi - C_lo) * (C - C_lo) + I_lo
+
+Everything is vectorized with NumPy, so thousands of readings are scored in
+one call (aqi_batch / aqi_columns). pm25_to_aqi stays as the scalar helper
+used for single readings.
+
+Tables:
+PM2.5	µg/m³, 24-hour (EPA 2024 revision)
+PM10	µg/m³, 24-hour
+NO2	ppb, 1-hour (readings store ppm unless AQI_NO2_UNITS=ppb)
+CO2	ppm, indoor ventilation indicator on the same 0-500 scale
+	(not part of the EPA AQI; bands follow common indoor guidance).
+	Returned as aqi_co2; aqi_category stays the PM2.5 category.
+'''
+
+import os
+import numpy as np
+
+# (C_lo, C_hi, I_lo, I_hi) rows
+BREAKPOINTS = {
+    "pm25": [
+        (0.0, 9.0, 0, 50),
+        (9.1, 35.4, 51, 100),
+        (35.5, 55.4, 101, 150),
+        (55.5, 125.4, 151, 200),
+        (125.5, 225.4, 201, 300),
+        (225.5, 325.4, 301, 500),
+    ],
+    "pm10": [
+        (0, 54, 0, 50),
+        (55, 154, 51, 100),
+        (155, 254, 101, 150),
+        (255, 354, 151, 200),
+        (355, 424, 201, 300),
+        (425, 504, 301, 400),
+        (505, 604, 401, 500),
+    ],
+    "no2": [
+        (0, 53, 0, 50),
+        (54, 100, 51, 100),
+        (101, 360, 101, 150),
+        (361, 649, 151, 200),
+        (650, 1249, 201, 300),
+        (1250, 1649, 301, 400),
+        (1650, 2049, 401, 500),
+    ],
+    "co2": [
+        (0, 800, 0, 50),
+        (801, 1000, 51, 100),
+        (1001, 1500, 101, 150),
+        (1501, 2000, 151, 200),
+        (2001, 5000, 201, 300),
+        (5001, 40000, 301, 500),
+    ],
+}
+
+# Decimal places concentrations are truncated to before the table lookup
+PRECISION = {"pm25": 1, "pm10": 0, "no2": 0, "co2": 0}
+
+# Readings store NO2 in ppm; the EPA table is in ppb
+NO2_SCALE = 1.0 if os.getenv("AQI_NO2_UNITS", "ppm").lower() == "ppb" else 1000.0
+
+CATEGORY_UPPER = np.array([50, 100, 150, 200, 300])
+CATEGORIES = np.array(["Good", "Moderate", "USG", "Unhealthy", "Very Unhealthy", "Hazardous"], dtype=object)
+
+# Table columns as arrays, prepared once
+_TABLES = {
+    name: tuple(np.array(col, dtype=float) for col in zip(*rows))
+    for name, rows in BREAKPOINTS.items()
+}
+
+def aqi_batch(pollutant: str, values) -> np.ndarray:
+    """AQI for an array of concentrations; NaN where the value is missing"""
+    c_lo, c_hi, i_lo, i_hi = _TABLES[pollutant]
+    c = np.asarray(values, dtype=float)
+    if pollutant == "no2":
+        c = c * NO2_SCALE
+    # Truncate to table precision (small epsilon guards against 9.1 -> 9.09999)
+    scale = 10.0 ** PRECISION[pollutant]
+    c = np.floor(np.clip(c, 0, None) * scale + 1e-9) / scale
+
+    idx = np.minimum(np.searchsorted(c_hi, c, side="left"), len(c_hi) - 1)
+    aqi = (i_hi[idx] - i_lo[idx]) / (c_hi[idx] - c_lo[idx]) * (c - c_lo[idx]) + i_lo[idx]
+    # Off the top of the table: report the maximum
+    aqi = np.where(c > c_hi[-1], i_hi[-1], aqi)
+    return np.floor(aqi + 0.5)
+
+def categories(aqi) -> list[str | None]:
+    """Category label for each AQI value (None where AQI is NaN)"""
+    aqi = np.asarray(aqi, dtype=float)
+    labels = CATEGORIES[np.searchsorted(CATEGORY_UPPER, aqi, side="left").clip(0, len(CATEGORIES) - 1)]
+    return np.where(np.isnan(aqi), None, labels).tolist()
+
+def to_ints(aqi: np.ndarray) -> list[int | None]:
+    """AQI array as JSON-friendly ints, None for missing values"""
+    return [None if v != v else int(v) for v in aqi.tolist()]
+
+def aqi_columns(pm25, pm10=None, no2=None, co2=None) -> dict[str, list]:
+    """AQI fields for columns of readings: aqi_pm25, aqi_category and optionally aqi_pm10/aqi_no2/aqi_co2"""
+    aqi_pm25 = aqi_batch("pm25", pm25)
+    out = {"aqi_pm25": to_ints(aqi_pm25), "aqi_category": categories(aqi_pm25)}
+    if pm10 is not None:
+        out["aqi_pm10"] = to_ints(aqi_batch("pm10", pm10))
+    if no2 is not None:
+        out["aqi_no2"] = to_ints(aqi_batch("no2", no2))
+    if co2 is not None:
+        out["aqi_co2"] = to_ints(aqi_batch("co2", co2))
+    return out
+
 def pm25_to_aqi(pm25: float | None) -> tuple[int | None, str | None]:
+    """AQI and category for a single PM2.5 value"""
     if pm25 is None:
         return None, None
-    if pm25 <= 12.0:
-        return 50, "Good"
-    if pm25 <= 35.4:
-        return 100, "Moderate"
-    if pm25 <= 55.4:
-        return 150, "USG"
-    if pm25 <= 150.4:
-        return 200, "Unhealthy"
-    if pm25 <= 250.4:
-        return 300, "Very Unhealthy"
-    return 400, "Hazardous"
+    aqi = aqi_batch("pm25", [pm25])
+    return to_ints(aqi)[0], categories(aqi)[0]
@@ -0,0 +1,223 @@
+'''
+Cold storage for old readings: compressed Parquet files on local disk.
+
+archive_before(cutoff) moves every reading older than cutoff out of MongoDB
+into hive-style partitions, one directory per sensor and month:
+
+    <READINGS_ARCHIVE_DIR>/sensor_id=<id>/month=<YYYY-MM>/part-<run>-<n>.parquet
+
+Files are zstd-compressed and written completely (temp file + rename) before
+the readings they hold are deleted, so an interrupted run leaves at worst a
+reading in both places; readers drop such duplicates by _id.
+
+_archive.json at the root records the newest cutoff. It is written before
+the first delete of a run, so readings that already left MongoDB are always
+inside the range reads look for in the archive. /readings only opens
+Parquet files for ranges with a start before it, so hot and open-ended
+queries never touch the disk archive; reads go month by month and stop as
+soon as the row limit is reached. The hourly/daily rollups are not
+archived, so aggregates keep covering archived history.
+
+pyarrow is required to archive or to read archived ranges. On a
+time-series readings collection the deletes need MongoDB 7.0+.
+'''
+
+import glob
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
+from ..models import Reading
+from .formats import FIELDS
+
+logger = logging.getLogger(__name__)
+
+READINGS_ARCHIVE_DIR = os.getenv("READINGS_ARCHIVE_DIR", "archive")
+READINGS_HOT_DAYS = int(os.getenv("READINGS_HOT_DAYS", "90"))
+
+MANIFEST = "_archive.json"
+
+# Serialized as JSON strings so the archive keeps everything a reading had
+JSON_FIELDS = ("stats", "raw_json")
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for the readings archive") from e
+    return pa, ds, pq
+
+def _naive_utc(ts: datetime) -> datetime:
+    """MongoDB hands back naive UTC datetimes; compare like with like"""
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+def _schema(pa):
+    types = {"sensor_id": pa.string(), "ts": pa.timestamp("ms", tz="UTC"), "firmware": pa.string()}
+    return pa.schema(
+        [("_id", pa.string())]
+        + [(f, types.get(f, pa.float64())) for f in FIELDS]
+        + [(f, pa.string()) for f in JSON_FIELDS]
+    )
+
+class Archive:
+    """Parquet archive rooted at one directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._mtime: Optional[float] = None
+        self._cutoff: Optional[datetime] = None
+
+    def _partition(self, sensor_id: str, ts: datetime) -> str:
+        return os.path.join(self.root, f"sensor_id={quote(sensor_id, safe='')}", f"month={ts:%Y-%m}")
+
+    def version(self) -> Optional[float]:
+        """Changes whenever an archive run completes (used in ETags)"""
+        try:
+            return os.stat(os.path.join(self.root, MANIFEST)).st_mtime
+        except OSError:
+            return None
+
+    def cutoff(self) -> Optional[datetime]:
+        """Everything older than this may be in the archive"""
+        mtime = self.version()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self._cutoff = None
+            if mtime is not None:
+                with open(os.path.join(self.root, MANIFEST)) as f:
+                    self._cutoff = datetime.fromisoformat(json.load(f)["cutoff"])
+        return self._cutoff
+
+    def covers(self, start: Optional[datetime]) -> bool:
+        """True if a range starting at start can reach archived readings.
+
+        Open-ended ranges (no start) are served from MongoDB only, so a plain
+        "latest N readings" query never scans the archive.
+        """
+        cutoff = self.cutoff()
+        return cutoff is not None and start is not None and _naive_utc(start) < cutoff
+
+    def _write(self, pa, pq, docs: list[dict], path: str):
+        columns = {"_id": [str(d["_id"]) for d in docs]}
+        for f in FIELDS:
+            columns[f] = [d.get(f) for d in docs]
+        columns["ts"] = [ts.replace(tzinfo=timezone.utc) for ts in columns["ts"]]
+        for f in JSON_FIELDS:
+            columns[f] = [json.dumps(d[f], default=str) if d.get(f) is not None else None for d in docs]
+        table = pa.Table.from_pydict(columns, schema=_schema(pa))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    async def archive_before(self, cutoff: datetime, batch_size: int = 50000) -> dict[str, int]:
+        """Move readings older than cutoff to Parquet; returns counts"""
+        pa, _, pq = _pyarrow()
+        cutoff = _naive_utc(cutoff)
+        collection = Reading.get_motor_collection()
+        run = int(time.time() * 1000)
+        counts = {"readings": 0, "files": 0}
+
+        # Advance the cutoff before anything is deleted: if the run stops
+        # part-way, reads already look in the archive for the moved rows
+        self._advance_cutoff(cutoff)
+
+        async def flush(partition: str, docs: list[dict]):
+            path = os.path.join(partition, f"part-{run}-{counts['files']}.parquet")
+            self._write(pa, pq, docs, path)
+            await collection.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+            counts["readings"] += len(docs)
+            counts["files"] += 1
+
+        # Sorted to match the (sensor_id, ts) index, so partitions arrive one after another
+        cursor = collection.find({"ts": {"$lt": cutoff}}).sort([("sensor_id", 1), ("ts", -1)])
+        partition, docs = None, []
+        async for doc in cursor.batch_size(min(batch_size, 10000)):
+            key = self._partition(doc["sensor_id"], doc["ts"])
+            if docs and (key != partition or len(docs) >= batch_size):
+                await flush(partition, docs)
+                docs = []
+            partition = key
+            docs.append(doc)
+        if docs:
+            await flush(partition, docs)
+
+        return counts
+
+    def _advance_cutoff(self, cutoff: datetime):
+        """Record cutoff in the manifest (atomically), never moving it backwards"""
+        previous = self.cutoff()
+        if previous is not None and cutoff <= previous:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"cutoff": cutoff.isoformat()}, f)
+        os.replace(path + ".tmp", path)
+
+    def read(
+        self,
+        sensor_id: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int,
+    ) -> list[dict]:
+        """Archived rows in [start, end] sorted by ts, at most limit (blocking I/O)"""
+        if not self.covers(start):
+            return []
+        pa, ds, _ = _pyarrow()
+        start = _naive_utc(start)
+        end = _naive_utc(end) if end else None
+
+        # Nothing newer than the cutoff was archived
+        cutoff = self.cutoff()
+        last = min(end, cutoff) if end else cutoff
+        sensor_dirs = (
+            [os.path.join(self.root, f"sensor_id={quote(sensor_id, safe='')}")]
+            if sensor_id else glob.glob(os.path.join(self.root, "sensor_id=*"))
+        )
+
+        stamp = pa.timestamp("ms", tz="UTC")
+        expr = ds.field("ts") >= pa.scalar(start.replace(tzinfo=timezone.utc), stamp)
+        if end:
+            expr &= ds.field("ts") <= pa.scalar(end.replace(tzinfo=timezone.utc), stamp)
+
+        # Month partitions in ts order, oldest first: once limit rows are
+        # collected no later month can hold an earlier reading, so stop there
+        rows, seen = [], set()
+        for month in _months(start, last):
+            files = [
+                path
+                for d in sensor_dirs
+                for path in glob.glob(os.path.join(d, f"month={month}", "*.parquet"))
+            ]
+            if not files:
+                continue
+            table = ds.dataset(files, format="parquet").to_table(filter=expr).sort_by("ts")
+            for row in table.to_pylist():
+                if row["_id"] in seen:
+                    continue
+                seen.add(row["_id"])
+                row["ts"] = _naive_utc(row["ts"])
+                for f in JSON_FIELDS:
+                    row[f] = json.loads(row[f]) if row[f] is not None else None
+                rows.append(row)
+                if len(rows) >= limit:
+                    return rows
+        return rows
+
+def _months(first: datetime, last: datetime) -> list[str]:
+    """YYYY-MM for every month from first to last, inclusive"""
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+archive = Archive(READINGS_ARCHIVE_DIR)
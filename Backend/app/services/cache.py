@@ -0,0 +1,107 @@
+'''
+Small async response cache for read endpoints polled by the dashboard.
+
+get_or_compute(key, ttl, compute) returns the cached value while it is
+younger than ttl seconds. On a miss only one caller runs compute(); any
+concurrent callers for the same key wait for that result instead of issuing
+their own query (single-flight).
+
+The computation runs as its own task that every caller (the first one
+included) awaits through asyncio.shield, so a client disconnecting while it
+waits cancels only its own request; the other waiters still get the result,
+and only errors raised by compute() itself reach them.
+
+invalidate(*keys) is called by rare writes (sensor updates). A value whose
+computation started before an invalidation is still returned to its waiters
+but is not cached, so a stale result never outlives the write.
+
+mark_stale(key, min_age) is the coalesced form used by ingest: the cached
+value expires once it is min_age seconds old instead of right away, so a
+steady stream of readings refreshes the entry at most every min_age seconds
+rather than turning every poll into a miss.
+'''
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+class ResponseCache:
+    """TTL cache with request coalescing"""
+
+    def __init__(self):
+        # key -> (expires, value, started): started is when compute() began
+        self._entries: dict[str, tuple[float, Any, float]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._generation: dict[str, int] = {}
+        # key -> (time of the last mark_stale, its min_age)
+        self._marked: dict[str, tuple[float, float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(self, key: str, ttl: float, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._fill(key, ttl, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, ttl: float, compute: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation.get(key, 0)
+        started = time.monotonic()
+        value = await compute()
+        if ttl > 0 and self._generation.get(key, 0) == generation:
+            expires = time.monotonic() + ttl
+            marked = self._marked.get(key)
+            if marked and marked[0] >= started:
+                # Readings arrived while computing; this value is already behind
+                expires = min(expires, started + marked[1])
+            self._entries[key] = (expires, value, started)
+        return value
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter went away
+
+    def invalidate(self, *keys: str):
+        """Drop cached values so the next request recomputes them"""
+        for key in keys:
+            self._entries.pop(key, None)
+            self._generation[key] = self._generation.get(key, 0) + 1
+
+    def mark_stale(self, key: str, min_age: float):
+        """Keep the cached value until it is min_age seconds old, then recompute"""
+        self._marked[key] = (time.monotonic(), min_age)
+        entry = self._entries.get(key)
+        if entry:
+            expires, value, started = entry
+            self._entries[key] = (min(expires, started + min_age), value, started)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+response_cache = ResponseCache()
+
+# Cache keys shared by the routes that fill and invalidate them
+MAP_LATEST = "map_latest"
+SENSORS = "sensors"
+
+# Oldest /map/latest may get while readings keep arriving (see mark_stale)
+CACHE_MIN_REFRESH_MAP_LATEST = float(os.getenv("CACHE_MIN_REFRESH_MAP_LATEST", "1"))
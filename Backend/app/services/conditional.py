@@ -0,0 +1,59 @@
+'''
+Conditional GET support (ETag -> 304 Not Modified).
+
+Cached endpoints (/map/latest, /sensors) keep their encoded body together
+with its validators in a CachedBody, so an unchanged poll is answered from
+memory without serializing anything. /readings derives its validator from a
+cheap index-only probe (row count and newest ts for the filter) before
+running the real query.
+
+Only ETags are emitted. Last-Modified would have to be the newest reading ts,
+which misses late readings with an older ts and sensor metadata edits, so
+If-Modified-Since would answer 304 for changed data. Cache-Control: no-cache
+makes browsers revalidate every poll, which is what turns repeat polls into
+304s.
+'''
+
+import hashlib
+import json
+from dataclasses import dataclass
+from fastapi import Request, Response
+
+@dataclass
+class CachedBody:
+    """Encoded JSON body plus its ETag"""
+    body: bytes
+    etag: str
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def encode_json(value) -> CachedBody:
+    """Serialize once and attach an ETag derived from the bytes"""
+    body = json.dumps(value, separators=(",", ":"), default=str).encode()
+    return CachedBody(body=body, etag=make_etag(body))
+
+def validator_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True when the client's cached copy is still current (If-None-Match)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag))
+
+def respond(request: Request, cached: CachedBody) -> Response:
+    """304 if the client is current, otherwise the cached body"""
+    if is_not_modified(request, cached.etag):
+        return not_modified(cached.etag)
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers=validator_headers(cached.etag),
+    )
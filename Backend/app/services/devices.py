@@ -0,0 +1,152 @@
+'''
+Device credentials and per-device rate limiting for ingest.
+
+Keys are loaded once instead of being re-parsed on every request:
+
+DEVICE_API_KEYS    comma-separated keys, each optionally bound to sensors:
+                   "pi-key-1:RPI-ENG-HALL-01|RPI-LIB-02,pi-key-2"
+                   (a key without sensors may post for any sensor_id)
+DEVICE_KEYS_FILE   optional JSON file {"key": ["SENSOR", ...] or null};
+                   re-read when its modification time changes, so keys can
+                   be added or revoked without a restart
+
+Setting INGEST_RATE_PER_SECOND gives each key an in-memory token bucket
+(that many requests per second, bursts up to INGEST_RATE_BURST) so a runaway
+device is turned away with 429 before its request touches MongoDB. It is 0
+(off) by default: fleets that share one key would otherwise be throttled as
+a single device.
+'''
+
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INGEST_RATE_PER_SECOND = float(os.getenv("INGEST_RATE_PER_SECOND", "0"))
+INGEST_RATE_BURST = int(os.getenv("INGEST_RATE_BURST", "20"))
+
+# How often the keys file is stat()ed for changes
+DEVICE_KEYS_CHECK_SECONDS = 5
+
+class Device:
+    """One API key and the sensors it may post for (None = any)"""
+
+    def __init__(self, key: str, sensors: Optional[frozenset[str]] = None):
+        self.key = key
+        self.sensors = sensors
+
+    def allows(self, sensor_id: str) -> bool:
+        return self.sensors is None or sensor_id in self.sensors
+
+class TokenBucket:
+    """Classic token bucket refilled lazily on each take()"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+def parse_keys(spec: str) -> dict[str, Device]:
+    """Parse the DEVICE_API_KEYS format"""
+    devices = {}
+    for entry in spec.split(","):
+        key, _, sensors = entry.strip().partition(":")
+        if not key:
+            continue
+        bound = frozenset(s.strip() for s in sensors.split("|") if s.strip())
+        devices[key] = Device(key, bound or None)
+    return devices
+
+class DeviceRegistry:
+    """Keys from the environment plus an optional, auto-reloaded keys file"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._env: dict[str, Device] = {}
+        self._file: dict[str, Device] = {}
+        self._path: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._buckets: dict[str, TokenBucket] = {}
+        self._loaded = False
+        self.throttled = 0
+
+    def load(self):
+        """Read DEVICE_API_KEYS and DEVICE_KEYS_FILE (called at startup)"""
+        self._env = parse_keys(os.getenv("DEVICE_API_KEYS", ""))
+        self._path = os.getenv("DEVICE_KEYS_FILE") or None
+        self._mtime = None
+        self._file = {}
+        self._loaded = True
+        self._refresh(force=True)
+
+    def _refresh(self, force: bool = False):
+        if not self._path:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked < DEVICE_KEYS_CHECK_SECONDS:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self._path).st_mtime
+        except OSError:
+            logger.warning("Device keys file %s not found", self._path)
+            self._file = {}
+            self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self._path) as f:
+                entries = json.load(f)
+            self._file = {
+                key: Device(key, frozenset(sensors) if sensors else None)
+                for key, sensors in entries.items()
+            }
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            # Keep the previous keys rather than locking every device out
+            logger.error("Could not load device keys file %s: %s", self._path, e)
+            return
+        self._mtime = mtime
+        logger.info("Loaded %d device key(s) from %s", len(self._file), self._path)
+
+    def lookup(self, key: str) -> Optional[Device]:
+        if not self._loaded:
+            self.load()
+        self._refresh()
+        return self._file.get(key) or self._env.get(key)
+
+    def throttle(self, key: str) -> float:
+        """0 if the request may proceed, else seconds the device should wait"""
+        if self.rate <= 0:
+            return 0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait:
+            self.throttled += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._env.keys() | self._file.keys()),
+            "throttled": self.throttled,
+        }
+
+device_registry = DeviceRegistry(INGEST_RATE_PER_SECOND, INGEST_RATE_BURST)
@@ -0,0 +1,149 @@
+'''
+Alternative encodings for /readings, built straight from MongoDB documents
+without creating a Pydantic model per row.
+
+Media type	                            Shape
+application/json	                    list of row objects (default)
+application/vnd.airiq.columnar+json	{"ts": [...], "pm25": [...], ...}
+application/msgpack	                   same columns, ts as epoch milliseconds
+application/vnd.apache.arrow.stream	  Arrow IPC stream, one record batch
+
+msgpack and pyarrow are optional; if one is not installed its format is
+reported as unavailable (the route answers 406).
+
+The default JSON rows are also built here, as plain dicts in ReadingOut
+field order, and encoded with orjson (stdlib json if it is missing) instead
+of being validated into models and serialized by FastAPI.
+
+Callers add the AQI columns (see services/aqi.aqi_columns) before encoding.
+'''
+
+from datetime import datetime, timezone
+
+FIELDS = ("sensor_id", "ts", "pm25", "pm10", "co2", "no2", "temp_c", "rh", "battery", "firmware")
+AQI_FIELDS = ("aqi_pm25", "aqi_pm10", "aqi_no2", "aqi_co2", "aqi_category")
+# Keys of one JSON row, in ReadingOut order: document fields, then AQI
+ROW_FIELDS = FIELDS + ("stats",)
+ROW_AQI_FIELDS = ("aqi_pm25", "aqi_category", "aqi_pm10", "aqi_no2", "aqi_co2")
+
+JSON = "json"
+COLUMNAR = "columnar"
+MSGPACK = "msgpack"
+ARROW = "arrow"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    COLUMNAR: "application/vnd.airiq.columnar+json",
+    MSGPACK: "application/msgpack",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+
+# Accept header values mapped to formats (includes common aliases)
+ACCEPTED = {
+    "application/json": JSON,
+    "application/vnd.airiq.columnar+json": COLUMNAR,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.apache.arrow.stream": ARROW,
+}
+
+class FormatUnavailable(Exception):
+    """Raised when the library needed for a format is not installed"""
+
+def negotiate(accept: str | None) -> str:
+    """Pick the best supported format from an Accept header (JSON if none match)"""
+    if not accept:
+        return JSON
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type.lower() in ACCEPTED and q > 0:
+            candidates.append((-q, position, ACCEPTED[media_type.lower()]))
+    return min(candidates)[2] if candidates else JSON
+
+async def collect_columns(cursor) -> dict[str, list]:
+    """Drain a cursor of reading documents into one list per field"""
+    columns: dict[str, list] = {f: [] for f in FIELDS}
+    appenders = [(f, columns[f].append) for f in FIELDS]
+    async for doc in cursor:
+        for field, append in appenders:
+            append(doc.get(field))
+    return columns
+
+def rows_to_columns(rows: list[dict]) -> dict[str, list]:
+    """Same as collect_columns for documents already in memory"""
+    return {f: [row.get(f) for row in rows] for f in FIELDS}
+
+def json_rows(docs: list[dict], aqi: dict[str, list]) -> list[dict]:
+    """Reading documents plus their AQI columns as ReadingOut-shaped dicts"""
+    aqi_items = [(f, aqi[f]) for f in ROW_AQI_FIELDS]
+    rows = []
+    for i, doc in enumerate(docs):
+        row = {f: doc.get(f) for f in ROW_FIELDS}
+        for f, column in aqi_items:
+            row[f] = column[i]
+        rows.append(row)
+    return rows
+
+def encode_json_rows(rows: list[dict]) -> bytes:
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(rows, separators=(",", ":"), default=lambda ts: ts.isoformat()).encode()
+    return orjson.dumps(rows)
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+def encode_columnar_json(columns: dict[str, list]) -> bytes:
+    import json
+    out = dict(columns)
+    out["ts"] = [_utc(ts).isoformat() for ts in columns["ts"]]
+    return json.dumps(out, separators=(",", ":")).encode()
+
+def encode_msgpack(columns: dict[str, list]) -> bytes:
+    try:
+        import msgpack
+    except ImportError as e:
+        raise FormatUnavailable("msgpack is not installed") from e
+    out = dict(columns)
+    out["ts"] = [int(_utc(ts).timestamp() * 1000) for ts in columns["ts"]]
+    return msgpack.packb(out, use_bin_type=True)
+
+def encode_arrow(columns: dict[str, list]) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise FormatUnavailable("pyarrow is not installed") from e
+    types = {
+        "sensor_id": pa.string(),
+        "ts": pa.timestamp("ms", tz="UTC"),
+        "firmware": pa.string(),
+        "aqi_pm25": pa.int16(),
+        "aqi_pm10": pa.int16(),
+        "aqi_no2": pa.int16(),
+        "aqi_co2": pa.int16(),
+        "aqi_category": pa.string(),
+    }
+    schema = pa.schema([(name, types.get(name, pa.float64())) for name in columns])
+    out = dict(columns)
+    out["ts"] = [_utc(ts) for ts in columns["ts"]]
+    table = pa.Table.from_pydict(out, schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+ENCODERS = {
+    COLUMNAR: encode_columnar_json,
+    MSGPACK: encode_msgpack,
+    ARROW: encode_arrow,
+}
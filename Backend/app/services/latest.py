@@ -0,0 +1,64 @@
+'''
+Maintains the sensor_latest collection (one row per sensor holding its newest
+reading), so /map/latest is a single query instead of one query per sensor.
+
+record_latest()  called by ingest with freshly stored readings
+rebuild_latest() one-off backfill from the readings collection
+
+Both use a conditional upsert: the filter only matches when the stored ts is
+older, and when a newer row already exists the upsert collides on _id and the
+duplicate-key error is ignored. Out-of-order readings therefore never move a
+sensor backwards in time.
+'''
+
+from datetime import datetime, timezone
+from typing import Iterable
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..models import Reading, SensorLatest
+
+LATEST_FIELDS = ("ts", "pm25", "pm10", "co2", "no2", "temp_c", "rh", "battery", "firmware")
+
+def _utc(ts: datetime) -> datetime:
+    # MongoDB stores UTC; naive datetimes are treated as UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+async def _upsert_latest(rows: dict[str, dict]):
+    """Conditionally upsert {sensor_id: fields} into sensor_latest"""
+    if not rows:
+        return
+    ops = [
+        UpdateOne({"_id": sensor_id, "ts": {"$lt": fields["ts"]}}, {"$set": fields}, upsert=True)
+        for sensor_id, fields in rows.items()
+    ]
+    try:
+        await SensorLatest.get_motor_collection().bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # 11000 = a newer row is already stored for that sensor
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+async def record_latest(readings: Iterable[Reading]):
+    """Push the newest of the given readings for each sensor into sensor_latest"""
+    newest: dict[str, dict] = {}
+    for r in readings:
+        ts = _utc(r.ts)
+        if r.sensor_id in newest and newest[r.sensor_id]["ts"] >= ts:
+            continue
+        newest[r.sensor_id] = {field: getattr(r, field) for field in LATEST_FIELDS}
+        newest[r.sensor_id]["ts"] = ts
+    await _upsert_latest(newest)
+
+async def rebuild_latest() -> int:
+    """Backfill sensor_latest from readings; returns the number of sensors seen"""
+    pipeline = [
+        # Walks the (sensor_id, ts desc) compound index
+        {"$sort": {"sensor_id": 1, "ts": -1}},
+        {"$group": {"_id": "$sensor_id", **{f: {"$first": f"${f}"} for f in LATEST_FIELDS}}},
+    ]
+    rows = {}
+    async for doc in Reading.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+        sensor_id = doc.pop("_id")
+        rows[sensor_id] = doc
+    await _upsert_latest(rows)
+    return len(rows)
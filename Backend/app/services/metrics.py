@@ -0,0 +1,241 @@
+'''
+In-process metrics in the Prometheus text format, served by GET /metrics.
+
+Counter / Gauge / Histogram hold one value (or bucket set) per label
+combination; render() writes them out in exposition format 0.0.4. Updates
+take a lock because PyMongo calls its listeners from Motor's worker threads.
+
+What is recorded:
+
+airiq_http_*            requests, latency and in-flight count per route
+                        (app/middleware.MetricsMiddleware)
+airiq_mongo_command_*   duration and failures per MongoDB command
+                        (MongoCommandMetrics, registered in db.init_db)
+airiq_mongo_pool_*      open / checked-out connections and checkout wait
+                        (MongoPoolMetrics, registered in db.init_db)
+airiq_ingest_queue_depth  readings waiting in or being flushed from the write-behind buffer
+'''
+
+import threading
+import time
+from typing import Callable, Optional
+from pymongo import monitoring
+
+# Request latencies, seconds
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# MongoDB commands and pool checkouts are usually much faster
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items
+        ]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+        self._function = function
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from function() at scrape time (unlabelled gauges)"""
+        self._function = function
+
+    def render(self) -> list[str]:
+        if self._function is not None:
+            items = [((), self._function())]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in items
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            else:
+                row[len(self.buckets)] += 1
+            row[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self._header()
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                le = f'le="{bound}"' if bound == "+Inf" else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {_number(cumulative)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "airiq_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "airiq_http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+http_in_flight = registry.register(Gauge(
+    "airiq_http_requests_in_flight", "HTTP requests being handled", ("method", "route")))
+
+mongo_duration = registry.register(Histogram(
+    "airiq_mongo_command_duration_seconds", "MongoDB command duration", ("command",), MONGO_BUCKETS))
+mongo_failures = registry.register(Counter(
+    "airiq_mongo_command_failures_total", "MongoDB commands that returned an error", ("command",)))
+
+pool_open = registry.register(Gauge(
+    "airiq_mongo_pool_connections", "Open MongoDB connections", ("address",)))
+pool_checked_out = registry.register(Gauge(
+    "airiq_mongo_pool_checked_out", "MongoDB connections currently in use", ("address",)))
+pool_wait = registry.register(Histogram(
+    "airiq_mongo_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("address",), MONGO_BUCKETS))
+pool_checkout_failures = registry.register(Counter(
+    "airiq_mongo_pool_checkout_failures_total", "Connection checkouts that failed", ("address", "reason")))
+
+ingest_queue_depth = registry.register(Gauge(
+    "airiq_ingest_queue_depth", "Readings waiting in or being flushed from the write-behind ingest buffer"))
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-command durations from PyMongo's command monitoring"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_failures.inc(event.command_name)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Pool size and checkout waits from PyMongo's CMAP events"""
+
+    def __init__(self):
+        # Checkout started/finished events arrive on the thread doing the checkout
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_open.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_open.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        pool_checkout_failures.inc(_address(event), event.reason)
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        pool_checked_out.dec(_address(event))
+
+    def _observe_wait(self, event):
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            pool_wait.observe(time.perf_counter() - started, _address(event))
+            self._local.started = None
@@ -0,0 +1,60 @@
+'''
+Sampling profiler for a single request (GET ...?profile=1 with X-Admin-Key).
+
+A background thread samples the event loop thread's Python stack every
+PROFILE_INTERVAL_MS milliseconds while the request runs. The result is
+returned in the "folded" format (one "frame;frame;frame count" line per
+distinct stack), which flamegraph.pl, speedscope and inferno read as is.
+
+The loop thread serves every request, so concurrent requests show up in the
+samples too; profile on a quiet instance. MongoDB I/O runs in Motor's worker
+threads and appears as time spent awaiting in the loop.
+'''
+
+import os
+import sys
+import threading
+from collections import Counter
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{'/'.join(path[-2:])}:{code.co_name}"
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="airiq-profiler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the folded stacks"""
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def start_sampler() -> StackSampler:
+    """Sample the calling thread (the event loop) until stop()"""
+    sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    sampler.start()
+    return sampler
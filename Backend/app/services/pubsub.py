@@ -0,0 +1,105 @@
+'''
+In-process pub/sub fan-out of newly stored readings for /api/v1/stream.
+
+Ingest calls publish_readings() after a successful write. Every subscriber
+has its own bounded queue and an optional sensor_id filter. When a slow
+consumer's queue is full, new events for it are dropped and the subscription
+is flagged; its next event is {"type": "resync"}, telling the client to
+refetch current state over REST before continuing with live events.
+
+Publishing never blocks ingest.
+'''
+
+import asyncio
+import os
+from datetime import timezone
+from typing import Iterable, Optional
+from ..models import Reading
+from .aqi import aqi_columns
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+
+EVENT_FIELDS = ("sensor_id", "pm25", "pm10", "co2", "no2", "temp_c", "rh", "battery", "firmware")
+
+class Subscription:
+    """One connected client"""
+
+    def __init__(self, sensor_ids: Optional[set[str]], maxsize: int):
+        self.sensor_ids = sensor_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.needs_resync = False
+
+    def matches(self, sensor_id: str) -> bool:
+        return not self.sensor_ids or sensor_id in self.sensor_ids
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.needs_resync = True
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, a resync marker after drops, or None on timeout"""
+        if self.needs_resync:
+            # Queued events predate the gap; the client refetches instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.needs_resync = False
+            return {"type": "resync"}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class Broker:
+    """Fans events out to every matching subscription"""
+
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self.published = 0
+
+    def subscribe(self, sensor_ids: Optional[Iterable[str]] = None, maxsize: int = STREAM_QUEUE_SIZE) -> Subscription:
+        sub = Subscription(set(sensor_ids) if sensor_ids else None, maxsize)
+        self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscriptions.discard(sub)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def publish(self, event: dict):
+        self.published += 1
+        for sub in list(self._subscriptions):
+            if sub.matches(event["sensor_id"]):
+                sub.offer(event)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": sum(sub.dropped for sub in self._subscriptions),
+        }
+
+broker = Broker()
+
+def publish_readings(readings: Iterable[Reading]):
+    """Publish stored readings (with AQI) to live subscribers"""
+    if not broker.has_subscribers():
+        return
+    readings = list(readings)
+    aqi = aqi_columns(
+        [r.pm25 for r in readings],
+        [r.pm10 for r in readings],
+        [r.no2 for r in readings],
+        [r.co2 for r in readings],
+    )
+    for i, r in enumerate(readings):
+        ts = r.ts.replace(tzinfo=timezone.utc) if r.ts.tzinfo is None else r.ts
+        event = {"type": "reading", "ts": ts.isoformat()}
+        event.update({f: getattr(r, f) for f in EVENT_FIELDS})
+        event.update({k: v[i] for k, v in aqi.items()})
+        broker.publish(event)
@@ -0,0 +1,154 @@
+'''
+Maintains the readings_1h and readings_1d rollup collections.
+
+Each rollup document holds {sum, count, min, max} per metric for one sensor
+and one bucket:
+
+apply_rollups()   called by ingest; folds new readings in with $inc/$min/$max
+                  upserts (one bulk_write per collection)
+rebuild_rollups() recomputes buckets for a time range from the readings
+                  collection (used by rebuild_rollups.py)
+pick_rollup()     chooses the coarsest rollup that can serve a bucket size
+
+Set READINGS_ROLLUPS=0 to disable both maintenance and the read path.
+'''
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..models import Reading, ReadingDaily, ReadingHourly
+from .aggregation import METRICS, bucket_start_expr, metric_accumulators
+
+ROLLUPS_ENABLED = os.getenv("READINGS_ROLLUPS", "1").lower() not in ("0", "false", "no")
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+# Finest to coarsest
+ROLLUPS = [
+    (HOUR_MS, ReadingHourly),
+    (DAY_MS, ReadingDaily),
+]
+
+def _utc(ts: datetime) -> datetime:
+    # MongoDB stores UTC; naive datetimes are treated as UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+def _bucket_start(ts: datetime, bucket_ms: int) -> datetime:
+    ms = int(_utc(ts).timestamp() * 1000)
+    return datetime.fromtimestamp((ms - ms % bucket_ms) / 1000, tz=timezone.utc)
+
+def pick_rollup(bucket_ms: int, tz_offset_minutes: int = 0):
+    """Coarsest rollup whose buckets tile the requested buckets, or None for raw readings"""
+    if not ROLLUPS_ENABLED:
+        return None
+    offset_ms = tz_offset_minutes * 60 * 1000
+    best = None
+    for rollup_ms, model in ROLLUPS:
+        if bucket_ms % rollup_ms == 0 and offset_ms % rollup_ms == 0:
+            best = model
+    return best
+
+async def _bulk_write(model, ops: list[UpdateOne]):
+    try:
+        await model.get_motor_collection().bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        # Two upserts raced to create the same bucket; the retry hits the existing row
+        await model.get_motor_collection().bulk_write(
+            [ops[err["index"]] for err in errors], ordered=False
+        )
+
+async def apply_rollups(readings: Iterable[Reading]):
+    """Fold readings into every rollup collection"""
+    if not ROLLUPS_ENABLED:
+        return
+    readings = list(readings)
+    for bucket_ms, model in ROLLUPS:
+        # Combine readings that land in the same bucket before touching MongoDB
+        buckets: dict[tuple[str, datetime], dict] = {}
+        for r in readings:
+            key = (r.sensor_id, _bucket_start(r.ts, bucket_ms))
+            update = buckets.setdefault(key, {"$inc": {}, "$min": {}, "$max": {}})
+            for m in METRICS:
+                value = getattr(r, m)
+                if value is None:
+                    continue
+                update["$inc"][f"{m}.sum"] = update["$inc"].get(f"{m}.sum", 0) + value
+                update["$inc"][f"{m}.count"] = update["$inc"].get(f"{m}.count", 0) + 1
+                update["$min"][f"{m}.min"] = min(update["$min"].get(f"{m}.min", value), value)
+                update["$max"][f"{m}.max"] = max(update["$max"].get(f"{m}.max", value), value)
+
+        ops = [
+            UpdateOne(
+                {"sensor_id": sensor_id, "ts": ts},
+                {op: fields for op, fields in update.items() if fields},
+                upsert=True,
+            )
+            for (sensor_id, ts), update in buckets.items()
+            if update["$inc"]
+        ]
+        if ops:
+            await _bulk_write(model, ops)
+
+async def rebuild_rollups(
+    start: datetime,
+    end: datetime,
+    sensor_id: Optional[str] = None,
+    batch_size: int = 1000,
+) -> dict[str, int]:
+    """Recompute rollup buckets overlapping [start, end) from raw readings.
+
+    Buckets in the range are deleted and re-inserted, so run it while ingest
+    for the affected sensors is quiet.
+    """
+    counts = {}
+    for bucket_ms, model in ROLLUPS:
+        # Widen to whole buckets so partially covered ones are recomputed in full
+        lo = _bucket_start(start, bucket_ms)
+        hi = _bucket_start(end, bucket_ms)
+        if hi < _utc(end):
+            hi += timedelta(milliseconds=bucket_ms)
+
+        match: dict = {"ts": {"$gte": lo, "$lt": hi}}
+        if sensor_id:
+            match["sensor_id"] = sensor_id
+
+        await model.get_motor_collection().delete_many(match)
+
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"sensor_id": "$sensor_id", "ts": bucket_start_expr(bucket_ms)},
+                **metric_accumulators(list(METRICS), ["avg", "min", "max"]),
+            }},
+        ]
+        collection = model.get_motor_collection()
+        batch, written = [], 0
+        async for doc in Reading.get_motor_collection().aggregate(pipeline, allowDiskUse=True):
+            row = {
+                "sensor_id": doc["_id"]["sensor_id"],
+                "ts": datetime.fromtimestamp(doc["_id"]["ts"] / 1000, tz=timezone.utc),
+            }
+            for m in METRICS:
+                if doc[f"{m}_count"]:
+                    row[m] = {
+                        "sum": doc[f"{m}_sum"],
+                        "count": doc[f"{m}_count"],
+                        "min": doc[f"{m}_min"],
+                        "max": doc[f"{m}_max"],
+                    }
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await collection.insert_many(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            await collection.insert_many(batch, ordered=False)
+            written += len(batch)
+        counts[model.get_settings().name] = written
+    return counts
@@ -0,0 +1,73 @@
+'''
+In-process registry of known sensor IDs.
+
+Ingest only needs to know whether a sensor already exists before storing a
+reading. The set of sensors almost never changes, so the registry keeps the
+IDs in memory:
+
+warm()        loads every sensor ID at startup (Sensor.find_all())
+ensure(ids)   answers "known sensor?" from memory; unknown IDs are looked up
+              in one query and the missing ones created with one insert_many
+              (returns the IDs it created)
+invalidate()  drops one ID (or everything) so the next lookup goes to MongoDB
+
+hits / misses count how many lookups were answered from memory.
+'''
+
+from typing import Iterable
+from beanie.operators import In
+from pymongo.errors import BulkWriteError
+from ..models import Sensor
+
+class SensorRegistry:
+    """Cache of sensor IDs known to exist in the sensors collection"""
+
+    def __init__(self):
+        self._known: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    async def warm(self):
+        """Load all sensor IDs from MongoDB"""
+        sensors = await Sensor.find_all().to_list()
+        self._known = {s.id for s in sensors}
+
+    def is_known(self, sensor_id: str) -> bool:
+        if sensor_id in self._known:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    async def ensure(self, sensor_ids: Iterable[str]) -> set[str]:
+        """Make sure every sensor in sensor_ids exists, creating missing ones in bulk"""
+        unknown = {sensor_id for sensor_id in set(sensor_ids) if not self.is_known(sensor_id)}
+        if not unknown:
+            return set()
+
+        existing = await Sensor.find(In(Sensor.id, list(unknown))).to_list()
+        missing = unknown - {s.id for s in existing}
+        if missing:
+            try:
+                await Sensor.insert_many(
+                    [Sensor(id=sensor_id, status="active") for sensor_id in sorted(missing)],
+                    ordered=False,
+                )
+            except BulkWriteError as e:
+                # Another request may have created the same sensor concurrently
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+        self._known |= unknown
+        return missing
+
+    def invalidate(self, sensor_id: str | None = None):
+        """Forget one sensor, or every sensor when sensor_id is None"""
+        if sensor_id is None:
+            self._known.clear()
+        else:
+            self._known.discard(sensor_id)
+
+    def stats(self) -> dict:
+        return {"size": len(self._known), "hits": self.hits, "misses": self.misses}
+
+sensor_registry = SensorRegistry()
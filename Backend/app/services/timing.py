@@ -0,0 +1,49 @@
+'''
+Per-request phase timings, reported in the Server-Timing response header.
+
+ServerTimingMiddleware (app/middleware.py) starts a fresh record for each
+request in a context variable; route code wraps its work in phase():
+
+    with phase("query"):
+        docs = await cursor.to_list(limit)
+
+Phases that run more than once in a request add up. "total" is always
+added.
+'''
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def header(self) -> str:
+        phases = {**self.phases, "total": time.perf_counter() - self.started}
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items())
+
+_current: ContextVar[Optional[Timings]] = ContextVar("server_timing", default=None)
+
+def start() -> Timings:
+    timings = Timings()
+    _current.set(timings)
+    return timings
+
+@contextmanager
+def phase(name: str):
+    """Time the enclosed block as one phase of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
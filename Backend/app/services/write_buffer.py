@@ -0,0 +1,161 @@
+'''
+Optional write-behind buffer for ingest (INGEST_WRITE_BEHIND=1).
+
+Validated readings are queued in memory and the request returns at once. A
+background task started in main.lifespan flushes the queue (insert, then
+the derived state, see services/writer.py) whenever INGEST_FLUSH_ITEMS readings are waiting or
+INGEST_FLUSH_MS milliseconds have passed since the first one arrived.
+
+INGEST_BUFFER_SIZE bounds the readings accepted but not yet flushed,
+including the batch the task is accumulating or writing; when it is
+reached ingest answers 503 with Retry-After so devices back off. close_db() calls stop(), which
+flushes everything still queued before the MongoDB client is closed.
+'''
+
+import asyncio
+import logging
+import os
+from ..models import Reading
+from .writer import after_store, insert_readings
+
+logger = logging.getLogger(__name__)
+
+INGEST_WRITE_BEHIND = os.getenv("INGEST_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+INGEST_BUFFER_SIZE = int(os.getenv("INGEST_BUFFER_SIZE", "10000"))
+INGEST_FLUSH_ITEMS = int(os.getenv("INGEST_FLUSH_ITEMS", "500"))
+INGEST_FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "200"))
+INGEST_RETRY_AFTER = int(os.getenv("INGEST_RETRY_AFTER", "1"))
+
+# Attempts per batch before it is logged and dropped
+FLUSH_ATTEMPTS = 3
+
+_STOP = object()
+
+class BufferFull(Exception):
+    """Raised when the queue cannot take more readings"""
+
+class WriteBuffer:
+    """Bounded queue of readings flushed in batches by a background task"""
+
+    def __init__(self, enabled: bool, maxsize: int, flush_items: int, flush_ms: int):
+        self.enabled = enabled
+        self.maxsize = maxsize
+        self.flush_items = flush_items
+        self.flush_seconds = flush_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._accepting = False
+        # Readings accepted and not yet flushed (queued or in the current batch)
+        self._pending = 0
+        self.flushed = 0
+        self.failed = 0
+
+    def depth(self) -> int:
+        return self._pending
+
+    def put_many(self, readings: list[Reading]):
+        """Queue readings, all or none"""
+        if not self._accepting or self._pending + len(readings) > self.maxsize:
+            raise BufferFull()
+        for reading in readings:
+            self._queue.put_nowait(reading)
+        self._pending += len(readings)
+
+    async def start(self):
+        if not self.enabled or self._task:
+            return
+        # Room for the stop sentinel on top of the readings
+        self._queue = asyncio.Queue(maxsize=self.maxsize + 1)
+        self._accepting = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting readings and flush everything already queued"""
+        if not self._task:
+            return
+        self._accepting = False
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_seconds
+            stopping = False
+            while len(batch) < self.flush_items:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            finally:
+                self._pending -= len(batch)
+            if stopping:
+                return
+
+    async def _attempt(self, what: str, step) -> bool:
+        """Run step up to FLUSH_ATTEMPTS times with backoff; True once it succeeds"""
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                await step()
+                return True
+            except Exception:
+                logger.exception("%s failed (attempt %d/%d)", what, attempt + 1, FLUSH_ATTEMPTS)
+                if attempt + 1 < FLUSH_ATTEMPTS:
+                    await asyncio.sleep(2 ** attempt * 0.5)
+        return False
+
+    async def _flush(self, batch: list[Reading]):
+        # The insert and the derived updates are retried separately: a failure
+        # after the insert must not store the batch again, and a failed rollup
+        # update must not re-run the steps that already went through
+        failed: dict[int, str] = {}
+
+        async def insert():
+            failed.clear()
+            failed.update(await insert_readings(batch))
+
+        if not await self._attempt(f"Inserting {len(batch)} buffered readings", insert):
+            self.failed += len(batch)
+            logger.error("Dropped %d buffered readings after %d attempts", len(batch), FLUSH_ATTEMPTS)
+            return
+        self.flushed += len(batch) - len(failed)
+        self.failed += len(failed)
+        for error in set(failed.values()):
+            logger.warning("Dropped buffered reading: %s", error)
+
+        stored = [r for n, r in enumerate(batch) if n not in failed]
+        done: set[str] = set()
+        updated = await self._attempt(
+            f"Updating derived state for {len(stored)} readings",
+            lambda: after_store(stored, done),
+        )
+        if not updated:
+            logger.error(
+                "Readings were stored but their %s update was skipped; "
+                "run backfill_latest.py / rebuild_rollups.py",
+                " and ".join(sorted({"latest", "rollups"} - done)),
+            )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "depth": self.depth(),
+            "flushed": self.flushed,
+            "failed": self.failed,
+        }
+
+write_buffer = WriteBuffer(INGEST_WRITE_BEHIND, INGEST_BUFFER_SIZE, INGEST_FLUSH_ITEMS, INGEST_FLUSH_MS)
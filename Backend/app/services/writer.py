@@ -0,0 +1,74 @@
+'''
+Stores readings and keeps the derived state in step.
+
+store_readings() is the one write path for direct ingest: a single unordered
+insert_many (insert_readings), then for the rows that were stored
+(after_store):
+
+- sensor_latest is moved forward (services/latest.py)
+- the hourly/daily rollups are updated (services/rollups.py)
+- the cached /map/latest response is marked stale (refreshed at most every
+  CACHE_MIN_REFRESH_MAP_LATEST seconds)
+- live /stream subscribers are notified
+
+The write-behind buffer calls the two halves itself so it can retry each
+one on its own.
+'''
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+from ..models import Reading
+from .cache import CACHE_MIN_REFRESH_MAP_LATEST, MAP_LATEST, response_cache
+from .latest import record_latest
+from .pubsub import publish_readings
+from .rollups import apply_rollups
+
+# Duplicate key: the row was stored by an earlier attempt with the same _id
+DUPLICATE_KEY = 11000
+
+async def after_store(stored: list[Reading], done: set[str] | None = None):
+    """Update everything derived from readings that were just written.
+
+    Steps that finish are added to `done`; passing the same set again on a
+    retry skips them, so the rollup counters are never incremented twice.
+    """
+    if not stored:
+        return
+    done = set() if done is None else done
+    if "latest" not in done:
+        await record_latest(stored)
+        done.add("latest")
+    if "rollups" not in done:
+        await apply_rollups(stored)
+        done.add("rollups")
+    # Coalesced: under steady ingest the map is recomputed at most once per interval
+    response_cache.mark_stale(MAP_LATEST, CACHE_MIN_REFRESH_MAP_LATEST)
+    publish_readings(stored)
+
+async def insert_readings(readings: list[Reading]) -> dict[int, str]:
+    """Insert readings in bulk; returns {position: error} for rows that failed.
+
+    Ids are assigned before the first attempt, so inserting the same list
+    again (after a lost acknowledgement, say) only reports duplicate keys,
+    which count as stored. Time-series collections have no unique _id index
+    and cannot detect the repeat.
+    """
+    failed: dict[int, str] = {}
+    if not readings:
+        return failed
+    for reading in readings:
+        if reading.id is None:
+            reading.id = PydanticObjectId()
+    try:
+        await Reading.insert_many(readings, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            if err.get("code") != DUPLICATE_KEY:
+                failed[err["index"]] = err.get("errmsg", "Write failed")
+    return failed
+
+async def store_readings(readings: list[Reading]) -> dict[int, str]:
+    """insert_readings() followed by after_store() for the rows that were stored"""
+    failed = await insert_readings(readings)
+    await after_store([r for n, r in enumerate(readings) if n not in failed])
+    return failed
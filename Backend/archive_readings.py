@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Move readings older than the hot window to the Parquet archive.
+
+Examples:
+    python archive_readings.py                        # older than READINGS_HOT_DAYS (default 90)
+    python archive_readings.py --days 30
+    python archive_readings.py --before 2025-01-01
+
+Files go to READINGS_ARCHIVE_DIR (default ./archive), partitioned as
+sensor_id=<id>/month=<YYYY-MM>/, and the archived readings are deleted from
+MongoDB. /api/v1/readings keeps serving them from the archive. Safe to run
+from cron; each run only picks up readings that are still in MongoDB.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db import init_db, close_db
+from app.services.archive import READINGS_HOT_DAYS, archive
+
+def parse_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+async def main(args):
+    cutoff = args.before or datetime.now(timezone.utc) - timedelta(days=args.days)
+    print("Connecting to MongoDB...")
+    await init_db()
+    try:
+        print(f"Archiving readings before {cutoff} to {archive.root}...")
+        counts = await archive.archive_before(cutoff, batch_size=args.batch)
+        print(f"✓ archived {counts['readings']} reading(s) into {counts['files']} file(s)")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old readings to Parquet")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--days", type=int, default=READINGS_HOT_DAYS, help=f"Keep this many days in MongoDB (default: {READINGS_HOT_DAYS})")
+    group.add_argument("--before", type=parse_ts, help="Archive everything before this ISO timestamp")
+    parser.add_argument("--batch", type=int, default=50000, help="Max readings per Parquet file (default: 50000)")
+    asyncio.run(main(parser.parse_args()))
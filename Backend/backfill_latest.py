@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Build the sensor_latest collection from existing readings.
+
+Run once after upgrading (ingest keeps it current afterwards):
+    python backfill_latest.py
+Safe to re-run: rows only ever move forward in time.
+"""
+
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db import init_db, close_db
+from app.services.latest import rebuild_latest
+
+async def main():
+    print("Connecting to MongoDB...")
+    await init_db()
+    try:
+        print("Rebuilding sensor_latest from readings...")
+        count = await rebuild_latest()
+        print(f"✓ sensor_latest updated for {count} sensor(s)")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load generator for the AirIQ backend.
+
+Simulates N virtual sensors posting readings at a fixed total rate while M
+dashboard clients poll /map/latest and /readings, then prints a JSON report
+with throughput, p50/p95/p99 latency and error rate per endpoint.
+
+Examples (from the Backend directory):
+    python -m benchmarks.load_test                                 # in-process, mongomock
+    python -m benchmarks.load_test --sensors 50000 --rate 2000 --dashboards 200 --duration 60
+    python -m benchmarks.load_test --batch 100 --output results/batch.json
+    python -m benchmarks.load_test --url http://localhost:8000 --key pi-key-1
+
+By default the app runs in-process behind httpx's ASGITransport with
+mongomock-motor standing in for MongoDB (pip install mongomock-motor httpx),
+which measures the Python request path without a database server. Pass --url
+to load a real deployment instead (if it sets INGEST_RATE_PER_SECOND, the
+per-key rate limit applies; raise it or set it to 0 there first).
+
+Ingest is open-loop: requests are scheduled at the target rate whether or not
+earlier ones finished, and latency is measured from the scheduled time, so a
+saturated server shows up as growing latency instead of a quietly lower rate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import numpy as np
+
+class Recorder:
+    """Latencies and outcomes per endpoint label"""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, label: str, started: float, status):
+        self.latencies[label].append(time.perf_counter() - started)
+        self.statuses[label][status] += 1
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            ms = np.asarray(values) * 1000
+            statuses = self.statuses[label]
+            errors = sum(n for s, n in statuses.items() if not (isinstance(s, int) and s < 400))
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            endpoints[label] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 1),
+                "error_rate": round(errors / len(values), 4),
+                "statuses": {str(s): n for s, n in statuses.items()},
+                "latency_ms": {
+                    "p50": round(float(p50), 2),
+                    "p95": round(float(p95), 2),
+                    "p99": round(float(p99), 2),
+                    "max": round(float(ms.max()), 2),
+                },
+            }
+        return endpoints
+
+async def request(client: httpx.AsyncClient, recorder: Recorder, label: str, started: float, method: str, url: str, **kwargs):
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(label, started, status)
+
+def make_reading(sensor_id: str) -> dict:
+    return {
+        "sensor_id": sensor_id,
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "pm25": round(random.uniform(2, 80), 1),
+        "pm10": round(random.uniform(5, 120), 1),
+        "co2": round(random.uniform(400, 1500)),
+        "temp_c": round(random.uniform(15, 30), 1),
+        "rh": round(random.uniform(20, 80), 1),
+    }
+
+async def ingest_load(client, recorder, args, sensor_ids, deadline, prefix):
+    """Open-loop producer: args.rate readings per second in total"""
+    headers = {"Authorization": f"Bearer {args.key}"}
+    per_request = max(args.batch, 1)
+    request_rate = args.rate / per_request
+    limit = asyncio.Semaphore(args.concurrency)
+    tasks = set()
+    start = time.perf_counter()
+    sent = 0
+    next_sensor = 0
+
+    async def send(scheduled: float, body):
+        async with limit:
+            if args.batch:
+                await request(client, recorder, "POST /ingest/batch", scheduled, "POST", f"{prefix}/ingest/batch", json=body, headers=headers)
+            else:
+                await request(client, recorder, "POST /ingest", scheduled, "POST", f"{prefix}/ingest", json=body, headers=headers)
+
+    while time.perf_counter() < deadline:
+        due = int((time.perf_counter() - start) * request_rate)
+        while sent < due:
+            scheduled = start + sent / request_rate
+            readings = []
+            for _ in range(per_request):
+                readings.append(make_reading(sensor_ids[next_sensor]))
+                next_sensor = (next_sensor + 1) % len(sensor_ids)
+            task = asyncio.create_task(send(scheduled, readings if args.batch else readings[0]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+        await asyncio.sleep(0.005)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+async def dashboard(client, recorder, args, sensor_ids, deadline, prefix):
+    """Closed-loop client: map, then one sensor's last day, then think time"""
+    etag = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        headers = {"If-None-Match": etag} if etag and args.conditional else {}
+        try:
+            response = await client.get(f"{prefix}/map/latest", headers=headers)
+            etag = response.headers.get("etag", etag)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        recorder.record("GET /map/latest", started, status)
+
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        started = time.perf_counter()
+        await request(client, recorder, "GET /readings", started, "GET", f"{prefix}/readings",
+                      params={"sensor_id": random.choice(sensor_ids), "start": since, "limit": 500})
+        await asyncio.sleep(random.uniform(0.5, 1.5) * args.think)
+
+@asynccontextmanager
+async def in_process_client(args):
+    """The FastAPI app on mongomock-motor, with lifespan, behind ASGITransport"""
+    os.environ.setdefault("DEVICE_API_KEYS", args.key)
+    os.environ.setdefault("INGEST_RATE_PER_SECOND", "0")
+    import mongomock_motor
+    import app.db as db
+    db.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            yield client
+
+@asynccontextmanager
+async def remote_client(args):
+    limits = httpx.Limits(max_connections=args.concurrency + args.dashboards)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        yield client
+
+async def main(args):
+    sensor_ids = [f"BENCH-{n:05d}" for n in range(args.sensors)]
+    prefix = args.prefix
+    recorder = Recorder()
+    factory = remote_client if args.url else in_process_client
+
+    async with factory(args) as client:
+        # Register every sensor up front so the run measures steady-state ingest
+        headers = {"Authorization": f"Bearer {args.key}"}
+        for n in range(0, len(sensor_ids), 1000):
+            await client.post(f"{prefix}/ingest/batch",
+                              json=[make_reading(s) for s in sensor_ids[n:n + 1000]], headers=headers)
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            ingest_load(client, recorder, args, sensor_ids, deadline, prefix),
+            *[dashboard(client, recorder, args, sensor_ids, deadline, prefix) for _ in range(args.dashboards)],
+        )
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "started_at": started_at.isoformat(),
+        "target": args.url or "in-process (mongomock-motor)",
+        "config": {
+            "sensors": args.sensors,
+            "rate": args.rate,
+            "batch": args.batch,
+            "dashboards": args.dashboards,
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": recorder.report(elapsed),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AirIQ load generator")
+    parser.add_argument("--sensors", type=int, default=1000, help="Virtual sensors (default: 1000)")
+    parser.add_argument("--rate", type=float, default=200, help="Readings per second across all sensors (default: 200)")
+    parser.add_argument("--batch", type=int, default=0, help="Readings per /ingest/batch request (default: 0 = single /ingest)")
+    parser.add_argument("--dashboards", type=int, default=20, help="Concurrent dashboard clients (default: 20)")
+    parser.add_argument("--think", type=float, default=2.0, help="Mean seconds between dashboard refreshes (default: 2)")
+    parser.add_argument("--conditional", action="store_true", help="Dashboards send If-None-Match on /map/latest")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (default: 30)")
+    parser.add_argument("--concurrency", type=int, default=256, help="Max in-flight ingest requests (default: 256)")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds (default: 30)")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--prefix", default="/api/v1", help="API prefix (default: /api/v1)")
+    parser.add_argument("--key", default="pi-key-1", help="Device API key (default: pi-key-1)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare the two ways /api/v1/readings can turn documents into JSON.
+
+    python -m benchmarks.serializer_bench               # 20k rows, 5 rounds
+    python -m benchmarks.serializer_bench --rows 5000 --rounds 10
+
+models   the previous path: validate each document into a ReadingView,
+         build a ReadingOut per row, then let FastAPI validate the list
+         against response_model=list[ReadingOut] and encode it
+fast     the current path: documents -> row dicts -> orjson bytes
+
+Both start from the same BSON-shaped dicts (what Motor returns with the
+READING_VIEW_PROJECTION) and include AQI scoring, so the difference is the
+per-row Pydantic work. MongoDB itself is not involved. Prints the best round
+of each as JSON with rows/second and the speedup.
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models import ReadingView
+from app.schemas import ReadingOut
+from app.services import formats
+from app.services.aqi import aqi_columns
+
+def make_docs(n: int) -> list[dict]:
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "sensor_id": f"BENCH-{i % 50:02d}",
+            "ts": start + timedelta(minutes=i),
+            "pm25": round(random.uniform(2, 80), 1),
+            "pm10": round(random.uniform(5, 120), 1),
+            "co2": float(random.randint(400, 1500)),
+            "no2": round(random.uniform(0, 0.2), 3),
+            "temp_c": round(random.uniform(15, 30), 1),
+            "rh": round(random.uniform(20, 80), 1),
+            "battery": None,
+            "firmware": "1.0.0",
+            "stats": None,
+        }
+        for i in range(n)
+    ]
+
+def _aqi(items, get):
+    return aqi_columns(*([get(r, f) for r in items] for f in ("pm25", "pm10", "no2", "co2")))
+
+ROWS_ADAPTER = TypeAdapter(list[ReadingOut])
+
+def models_path(docs: list[dict]) -> bytes:
+    readings = [ReadingView.model_validate(doc) for doc in docs]
+    aqi = _aqi(readings, getattr)
+    rows = [
+        ReadingOut(
+            sensor_id=r.sensor_id, ts=r.ts, pm25=r.pm25, pm10=r.pm10, co2=r.co2, no2=r.no2,
+            temp_c=r.temp_c, rh=r.rh, battery=r.battery, firmware=r.firmware, stats=r.stats,
+            aqi_pm25=aqi["aqi_pm25"][i], aqi_category=aqi["aqi_category"][i],
+            aqi_pm10=aqi["aqi_pm10"][i], aqi_no2=aqi["aqi_no2"][i], aqi_co2=aqi["aqi_co2"][i],
+        )
+        for i, r in enumerate(readings)
+    ]
+    # What FastAPI does with a response_model: validate again, then encode
+    validated = ROWS_ADAPTER.validate_python(rows, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+def fast_path(docs: list[dict]) -> bytes:
+    aqi = _aqi(docs, dict.get)
+    return formats.encode_json_rows(formats.json_rows(docs, aqi))
+
+def best_of(fn, docs, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main(args):
+    docs = make_docs(args.rows)
+    # Same rows either way (key order and values)
+    assert json.loads(models_path(docs[:100])) == json.loads(fast_path(docs[:100]))
+
+    report = {"rows": args.rows, "rounds": args.rounds}
+    for name, fn in (("models", models_path), ("fast", fast_path)):
+        seconds = best_of(fn, docs, args.rounds)
+        report[name] = {"ms": round(seconds * 1000, 1), "rows_per_s": round(args.rows / seconds)}
+    report["speedup"] = round(report["fast"]["rows_per_s"] / report["models"]["rows_per_s"], 1)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Readings JSON serializer benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per response (default: 20000)")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per path; the best is reported (default: 5)")
+    main(parser.parse_args())
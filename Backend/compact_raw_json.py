@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Shrink raw_json on readings that are already stored.
+
+Examples:
+    python compact_raw_json.py                 # drop raw_json entirely
+    python compact_raw_json.py --mode extra    # keep only READINGS_EXTRA_KEYS
+    python compact_raw_json.py --batch 5000
+
+Pair it with READINGS_RAW_JSON=none (or extra) so new readings are stored
+the same way. Documents are processed in _id order, --batch at a time, so the
+script can be stopped and re-run at any point. On a time-series readings
+collection the updates need MongoDB 7.0+.
+"""
+
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from pymongo import UpdateOne
+from app.db import init_db, close_db
+from app.models import READINGS_EXTRA_KEYS, Reading
+
+# Keys already stored as typed fields on every reading
+KNOWN_FIELDS = set(Reading.model_fields) - {"id", "revision_id", "raw_json"}
+
+async def compact(mode: str, batch_size: int) -> int:
+    collection = Reading.get_motor_collection()
+    query = {"raw_json": {"$ne": None}}
+    total = await collection.count_documents(query)
+    print(f"  {total} reading(s) with raw_json")
+
+    done = 0
+    last_id = None
+    while True:
+        page = dict(query)
+        if last_id is not None:
+            page["_id"] = {"$gt": last_id}
+        docs = await collection.find(page, projection={"raw_json": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return done
+        last_id = docs[-1]["_id"]
+
+        if mode == "none":
+            await collection.update_many(
+                {"_id": {"$in": [d["_id"] for d in docs]}},
+                {"$unset": {"raw_json": ""}},
+            )
+        else:
+            ops = []
+            for d in docs:
+                extra = {k: v for k, v in d["raw_json"].items() if k not in KNOWN_FIELDS and k in READINGS_EXTRA_KEYS}
+                update = {"$set": {"raw_json": extra}} if extra else {"$unset": {"raw_json": ""}}
+                ops.append(UpdateOne({"_id": d["_id"]}, update))
+            await collection.bulk_write(ops, ordered=False)
+        done += len(docs)
+        print(f"  ✓ {done}/{total}")
+
+async def main(args):
+    print("Connecting to MongoDB...")
+    await init_db()
+    try:
+        print(f"Compacting raw_json (mode: {args.mode})...")
+        count = await compact(args.mode, args.batch)
+        print(f"✓ compacted {count} reading(s)")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strip duplicated raw_json from stored readings")
+    parser.add_argument("--mode", choices=["none", "extra"], default="none",
+                        help="none: remove raw_json; extra: keep only READINGS_EXTRA_KEYS (default: none)")
+    parser.add_argument("--batch", type=int, default=2000, help="Readings per update (default: 2000)")
+    asyncio.run(main(parser.parse_args()))
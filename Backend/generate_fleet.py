@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic readings for a large sensor fleet, for load and scaling tests.
+
+Examples:
+    python generate_fleet.py --sensors 1000 --days 30 --out fleet/      # NDJSON files
+    python generate_fleet.py --sensors 200 --days 7 --mongo             # straight into MongoDB
+    python generate_fleet.py --center 40.7128,-74.0060 --radius-km 40 --interval 300 --out nyc/
+
+Sensors are scattered uniformly over a disc around --center; ones closer to
+the middle see more pollution. Each series is built with numpy, one sensor at
+a time:
+
+- diurnal traffic peaks (local morning/evening rush hour) and lower weekends
+- temperature and humidity following the sun, humidity anti-correlated
+- regional pollution episodes (smoke, inversions) that hit nearby sensors
+  together, plus short local spikes
+- slow per-sensor calibration drift on the particulate channels
+- outages of minutes to days, and isolated dropped samples, removed from the
+  series rather than stored as nulls
+
+--out writes fleet-NNNN.ndjson files (--per-file sensors each, ts in epoch
+milliseconds), --workers processes at a time, plus sensors.json (a JSON
+array, so a *.ndjson glob does not pick it up) with the generated locations.
+Load both with:
+
+    python airiq_import.py fleet/fleet-*.ndjson --sensors fleet/sensors.json
+
+--mongo upserts the sensors and bulk-inserts readings with --concurrency
+insert_many calls in flight, then rebuilds sensor_latest and the rollups
+(skip with --skip-derived). --seed makes runs reproducible.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FIELDS = ("pm25", "pm10", "co2", "no2", "temp_c", "rh", "battery")
+FIRMWARE = ("1.0.0", "1.1.0", "1.2.1")
+KM_PER_DEGREE = 111.32
+DAY_S = 24 * 60 * 60
+
+def parse_center(value: str) -> tuple[float, float]:
+    lat, lon = (float(part) for part in value.split(","))
+    return lat, lon
+
+def parse_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def scatter(rng, n: int, center: tuple[float, float], radius_km: float):
+    """n points uniform over a disc; returns lat, lon and distance as a fraction of the radius"""
+    frac = np.sqrt(rng.random(n))
+    theta = rng.random(n) * 2 * np.pi
+    dist_km = frac * radius_km
+    lat = center[0] + dist_km * np.sin(theta) / KM_PER_DEGREE
+    lon = center[1] + dist_km * np.cos(theta) / (KM_PER_DEGREE * math.cos(math.radians(center[0])))
+    return lat, lon, frac
+
+def smooth_noise(rng, n: int, width: int) -> np.ndarray:
+    """Unit-variance noise correlated over roughly `width` samples"""
+    width = max(1, min(width, n))
+    kernel = np.hanning(width + 2)[1:-1]
+    noise = np.convolve(rng.standard_normal(n + width), kernel, mode="same")[:n]
+    return noise / np.sqrt(np.sum(kernel**2))
+
+def window(n: int) -> np.ndarray:
+    """Rise-and-fall profile of an episode lasting n samples"""
+    return np.sin(np.linspace(0, np.pi, n)) ** 2
+
+class Fleet:
+    """Sensor layout and fleet-wide episodes, shared by every generated series"""
+
+    def __init__(self, args):
+        self.seed = args.seed
+        self.rng = np.random.default_rng(args.seed)
+        self.interval = args.interval
+        self.start_s = int(args.end.timestamp()) - args.days * DAY_S
+        self.samples = args.days * DAY_S // args.interval
+        self.t_s = self.start_s + np.arange(self.samples, dtype=np.int64) * args.interval
+
+        n = args.sensors
+        self.ids = [f"{args.prefix}-{i:05d}" for i in range(n)]
+        self.lat, self.lon, self.urban = scatter(self.rng, n, args.center, args.radius_km)
+        # Closer to the centre means more traffic
+        self.urban = 1.6 - 0.9 * self.urban
+        self.base_pm25 = self.rng.lognormal(math.log(9), 0.35, n)
+        self.pm_ratio = self.rng.uniform(1.3, 2.0, n)
+        self.drift = self.rng.normal(0, 0.08, n)
+        self.firmware = self.rng.choice(len(FIRMWARE), n, p=[0.2, 0.5, 0.3])
+
+        # Regional episodes: about one every ten days, each with its own footprint
+        per_day = DAY_S // args.interval
+        count = self.rng.poisson(args.days / 10)
+        self.episodes = []
+        for _ in range(count):
+            length = int(self.rng.uniform(0.25, 3) * per_day)
+            start = int(self.rng.integers(-length // 2, max(1, self.samples - length // 2)))
+            ep_lat, ep_lon, _ = scatter(self.rng, 1, args.center, args.radius_km * 1.5)
+            self.episodes.append({
+                "start": start,
+                "length": max(2, length),
+                "amplitude": self.rng.lognormal(math.log(35), 0.5),
+                "lat": ep_lat[0],
+                "lon": ep_lon[0],
+                "radius_km": self.rng.uniform(0.5, 2) * args.radius_km,
+            })
+
+        self.hours_utc = (self.t_s % DAY_S) / 3600
+        # 1970-01-01 was a Thursday; Monday = 0
+        self.weekday = ((self.t_s // DAY_S) + 3) % 7
+        self.progress = (self.t_s - self.start_s) / max(1, args.days * DAY_S)
+
+    def sensors(self) -> list[dict]:
+        return [
+            {
+                "id": sensor_id,
+                "name": f"Simulated sensor {i}",
+                "lat": round(float(self.lat[i]), 6),
+                "lon": round(float(self.lon[i]), 6),
+                "location_label": f"Simulated site {i}",
+                "status": "active",
+            }
+            for i, sensor_id in enumerate(self.ids)
+        ]
+
+    def series(self, i: int) -> dict[str, np.ndarray]:
+        """Columns for sensor i; rows inside outages are already removed"""
+        # Own stream per sensor, so a series doesn't depend on generation order
+        rng = np.random.default_rng([self.seed, i])
+        n = self.samples
+        per_hour = max(1, 3600 // self.interval)
+
+        local = (self.hours_utc + self.lon[i] / 15) % 24
+        weekend = self.weekday >= 5
+        # Two rush-hour peaks, damped at weekends
+        traffic = np.exp(-((local - 8) ** 2) / 3) + 0.8 * np.exp(-((local - 18) ** 2) / 4)
+        traffic *= np.where(weekend, 0.45, 1.0)
+
+        pm25 = self.base_pm25[i] * self.urban[i] * (0.7 + 0.9 * traffic)
+        pm25 *= np.exp(0.25 * smooth_noise(rng, n, 6 * per_hour))
+
+        for ep in self.episodes:
+            d_km = math.hypot(
+                (self.lat[i] - ep["lat"]) * KM_PER_DEGREE,
+                (self.lon[i] - ep["lon"]) * KM_PER_DEGREE * math.cos(math.radians(ep["lat"])),
+            )
+            weight = ep["amplitude"] * math.exp(-(d_km**2) / (2 * ep["radius_km"] ** 2))
+            lo, hi = max(0, ep["start"]), min(n, ep["start"] + ep["length"])
+            if hi > lo and weight > 0.5:
+                profile = window(ep["length"])[lo - ep["start"]:hi - ep["start"]]
+                pm25[lo:hi] += weight * profile
+
+        # Local spikes (cooking, construction, a truck idling nearby)
+        for _ in range(rng.poisson(n / (per_hour * 24 * 3))):
+            length = int(rng.integers(max(2, per_hour // 6), 2 * per_hour + 2))
+            start = int(rng.integers(0, n))
+            end = min(n, start + length)
+            pm25[start:end] += rng.lognormal(math.log(25), 0.6) * window(length)[:end - start]
+
+        # Particulate channels drift as the optics age
+        gain = 1 + self.drift[i] * self.progress
+        pm25 *= gain
+        pm10 = pm25 * self.pm_ratio[i] + rng.gamma(2, 2, n) * gain
+        no2 = 0.008 + 0.03 * traffic * self.urban[i] + 0.004 * smooth_noise(rng, n, 2 * per_hour)
+        co2 = 415 + 45 * traffic * self.urban[i] + 8 * smooth_noise(rng, n, 3 * per_hour)
+
+        day_of_year = (self.t_s % (365 * DAY_S)) / DAY_S
+        season = 8 * np.cos(2 * np.pi * (day_of_year - 200) / 365)
+        sun = np.cos((local - 15) * np.pi / 12)
+        temp_c = 18 + season + 5 * sun + 1.2 * smooth_noise(rng, n, 4 * per_hour) + rng.normal(0, 0.3)
+        rh = 55 - 2.2 * (temp_c - 18) + 6 * smooth_noise(rng, n, 8 * per_hour)
+
+        # Battery drains and is swapped/recharged when it gets low
+        drain = rng.uniform(0.5, 3) / (per_hour * 24)
+        battery = 100 - np.mod(np.arange(n) * drain + rng.uniform(0, 80), 80)
+
+        keep = rng.random(n) > 0.002
+        for _ in range(rng.poisson(n / (per_hour * 24 * 15))):
+            length = int(rng.exponential(6 * per_hour)) + 1
+            start = int(rng.integers(0, n))
+            keep[start:start + length] = False
+
+        columns = {
+            "ts_ms": self.t_s * 1000,
+            "pm25": np.round(np.clip(pm25, 0, 1000), 1),
+            "pm10": np.round(np.clip(pm10, 0, 2000), 1),
+            "co2": np.round(np.clip(co2, 350, 10000), 0),
+            "no2": np.round(np.clip(no2, 0, 10), 3),
+            "temp_c": np.round(temp_c, 1),
+            "rh": np.round(np.clip(rh, 2, 100), 1),
+            "battery": np.round(battery, 1),
+        }
+        return {name: column[keep] for name, column in columns.items()}
+
+def ndjson_format(sensor_id: str, firmware: str) -> str:
+    """np.savetxt row format producing one JSON object per line"""
+    return (
+        f'{{"sensor_id":"{sensor_id}","ts":%d,"pm25":%.1f,"pm10":%.1f,"co2":%.0f,"no2":%.3f,'
+        f'"temp_c":%.1f,"rh":%.1f,"battery":%.1f,"firmware":"{firmware}"}}'
+    )
+
+def write_file(args, index: int) -> int:
+    """Write fleet-<index>.ndjson; runs in a worker process"""
+    fleet = Fleet(args)
+    sensors = range(index * args.per_file, min(len(fleet.ids), (index + 1) * args.per_file))
+    total = 0
+    with open(Path(args.out) / f"fleet-{index:04d}.ndjson", "w", encoding="utf-8") as f:
+        for i in sensors:
+            cols = fleet.series(i)
+            line = ndjson_format(fleet.ids[i], FIRMWARE[fleet.firmware[i]]) + "\n"
+            rows = zip(cols["ts_ms"].tolist(), *(cols[name].tolist() for name in FIELDS))
+            f.write("".join(map(line.__mod__, rows)))
+            total += len(cols["ts_ms"])
+    return total
+
+def write_ndjson(fleet: Fleet, args) -> int:
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    with open(out / "sensors.json", "w", encoding="utf-8") as f:
+        json.dump(fleet.sensors(), f, indent=1)
+
+    # Formatting text is the slow part, so files are written in parallel
+    files = math.ceil(len(fleet.ids) / args.per_file)
+    total = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(write_file, args, index) for index in range(files)]
+        for done, future in enumerate(as_completed(futures), 1):
+            total += future.result()
+            report(min(len(fleet.ids), done * args.per_file), len(fleet.ids), total, started)
+    return total
+
+async def write_mongo(fleet: Fleet, args) -> int:
+    from airiq_import import upsert_sensors
+    from app.db import init_db, close_db
+    from app.models import Reading
+    from app.services.latest import rebuild_latest
+    from app.services.rollups import rebuild_rollups
+
+    print("Connecting to MongoDB...")
+    await init_db()
+    try:
+        print(f"✓ upserted {await upsert_sensors(fleet.sensors())} sensor(s)")
+
+        collection = Reading.get_motor_collection()
+        slots = asyncio.Semaphore(args.concurrency)
+        pending: set[asyncio.Task] = set()
+
+        async def insert(docs):
+            try:
+                await collection.insert_many(docs, ordered=False)
+            finally:
+                slots.release()
+
+        total = 0
+        started = time.perf_counter()
+        for i, sensor_id in enumerate(fleet.ids):
+            cols = fleet.series(i)
+            firmware = FIRMWARE[fleet.firmware[i]]
+            # datetime64[ms] -> naive UTC datetimes, which MongoDB stores as-is
+            ts = cols["ts_ms"].astype("datetime64[ms]").tolist()
+            values = [cols[name].tolist() for name in FIELDS]
+            docs = [
+                {"sensor_id": sensor_id, "ts": t, **dict(zip(FIELDS, row)), "firmware": firmware}
+                for t, *row in zip(ts, *values)
+            ]
+            for lo in range(0, len(docs), args.batch):
+                await slots.acquire()
+                task = asyncio.create_task(insert(docs[lo:lo + args.batch]))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            total += len(docs)
+            report(i + 1, len(fleet.ids), total, started)
+        if pending:
+            await asyncio.gather(*pending)
+
+        if args.skip_derived or not total:
+            return total
+        start = datetime.fromtimestamp(fleet.start_s, timezone.utc)
+        end = datetime.fromtimestamp(int(fleet.t_s[-1]) + 1, timezone.utc)
+        print("Rebuilding sensor_latest...")
+        count = await rebuild_latest()
+        print(f"✓ sensor_latest updated for {count} sensor(s)")
+        print(f"Rebuilding rollups from {start} to {end}...")
+        for name, written in (await rebuild_rollups(start, end)).items():
+            print(f"  ✓ {name}: {written} bucket(s)")
+        return total
+    finally:
+        await close_db()
+
+_last_report = 0.0
+
+def report(done: int, sensors: int, rows: int, started: float):
+    global _last_report
+    now = time.perf_counter()
+    if done < sensors and now - _last_report < 2:
+        return
+    _last_report = now
+    elapsed = now - started
+    print(f"  {done:,}/{sensors:,} sensors, {rows:,} readings ({rows / elapsed if elapsed else 0:,.0f} rows/s)")
+
+def main(args):
+    # Pin the range so every worker process generates the same timeline
+    args.end = args.end or datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    fleet = Fleet(args)
+    print(
+        f"Generating {len(fleet.ids):,} sensors x {fleet.samples:,} samples "
+        f"({args.interval}s interval, {len(fleet.episodes)} regional episode(s))..."
+    )
+    started = time.perf_counter()
+    if args.out:
+        total = write_ndjson(fleet, args)
+    else:
+        total = asyncio.run(write_mongo(fleet, args))
+    elapsed = time.perf_counter() - started
+    print(f"✓ {total:,} reading(s) in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    if args.out:
+        out = Path(args.out)
+        print(f"✓ wrote {out}; load with: python airiq_import.py {out / 'fleet-*.ndjson'} --sensors {out / 'sensors.json'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic readings for a sensor fleet")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="Write NDJSON files to this directory")
+    target.add_argument("--mongo", action="store_true", help="Insert straight into MongoDB")
+    parser.add_argument("--sensors", type=int, default=1000, help="Number of sensors (default: 1000)")
+    parser.add_argument("--days", type=int, default=30, help="Days of history (default: 30)")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between readings (default: 60)")
+    parser.add_argument("--end", type=parse_ts, help="ISO end of the generated range (default: now)")
+    parser.add_argument("--center", type=parse_center, default=(32.7313, -97.1106), help="lat,lon the fleet is scattered around")
+    parser.add_argument("--radius-km", type=float, default=25, help="Scatter radius in km (default: 25)")
+    parser.add_argument("--prefix", default="SIM", help="Sensor ID prefix (default: SIM)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--per-file", type=int, default=100, help="Sensors per NDJSON file (default: 100)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Processes writing NDJSON files (default: up to 4)")
+    parser.add_argument("--batch", type=int, default=5000, help="Readings per insert_many (default: 5000)")
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many calls in flight (default: 4)")
+    parser.add_argument("--skip-derived", action="store_true", help="Don't rebuild sensor_latest and rollups after --mongo")
+    args = parser.parse_args()
+    if min(args.sensors, args.days, args.interval, args.per_file, args.workers, args.batch, args.concurrency) < 1:
+        parser.error("counts and sizes must be at least 1")
+    main(args)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Copy the readings collection into a MongoDB time-series collection.
+
+Examples:
+    python migrate_timeseries.py                      # copy readings -> readings_ts
+    python migrate_timeseries.py --granularity seconds --chunk 20000
+    python migrate_timeseries.py --swap               # copy, then switch collections
+
+Documents are copied in _id order, --chunk at a time, so an interrupted run
+can simply be started again: it resumes after the last copied _id.
+
+--swap renames readings to readings_legacy and readings_ts to readings once
+the copy is complete. Stop ingest first (or let it drain), then start the
+backend with READINGS_TIMESERIES=1 so it keeps using the new layout.
+Time-series collections need MongoDB 5.0+ (6.3+ recommended).
+"""
+
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from app.db import MONGODB_URL, DATABASE_NAME
+
+async def ensure_target(db, name: str, granularity: str):
+    """Create the time-series collection unless it already exists"""
+    if name in await db.list_collection_names():
+        options = (await db[name].options()).get("timeseries")
+        if not options:
+            raise SystemExit(f"{name} exists and is not a time-series collection")
+        return
+    await db.create_collection(
+        name,
+        timeseries={"timeField": "ts", "metaField": "sensor_id", "granularity": granularity},
+    )
+    await db[name].create_index([("sensor_id", 1), ("ts", -1)])
+    print(f"  ✓ created time-series collection {name} ({granularity})")
+
+async def copy(source, target, chunk: int) -> int:
+    """Copy documents newer (by _id) than the last one already in target"""
+    last = await target.find_one({}, projection={"_id": 1}, sort=[("_id", -1)])
+    query = {"_id": {"$gt": last["_id"]}} if last else {}
+    total = await source.count_documents(query)
+    if last:
+        print(f"  resuming after {last['_id']}")
+    print(f"  {total} document(s) to copy")
+
+    copied = 0
+    while True:
+        batch = await source.find(query).sort("_id", 1).limit(chunk).to_list(chunk)
+        if not batch:
+            return copied
+        try:
+            await target.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Documents time-series collections refuse (e.g. missing ts) are reported and skipped
+            for err in e.details.get("writeErrors", []):
+                print(f"  ✗ {batch[err['index']]['_id']}: {err.get('errmsg')}")
+        copied += len(batch)
+        query = {"_id": {"$gt": batch[-1]["_id"]}}
+        print(f"  ✓ {copied}/{total}")
+
+async def main(args):
+    print("Connecting to MongoDB...")
+    client = AsyncIOMotorClient(MONGODB_URL)
+    try:
+        db = client[DATABASE_NAME]
+        await ensure_target(db, args.target, args.granularity)
+        print(f"Copying {args.source} -> {args.target}...")
+        copied = await copy(db[args.source], db[args.target], args.chunk)
+        print(f"✓ copied {copied} document(s)")
+
+        if args.swap:
+            source_count = await db[args.source].count_documents({})
+            target_count = await db[args.target].count_documents({})
+            if target_count < source_count:
+                raise SystemExit(f"{args.target} has {target_count} of {source_count} documents, not swapping")
+            legacy = f"{args.source}_legacy"
+            await db[args.source].rename(legacy)
+            await db[args.target].rename(args.source)
+            print(f"✓ {args.source} is now the time-series collection (old data kept in {legacy})")
+            print("  Start the backend with READINGS_TIMESERIES=1")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate readings to a time-series collection")
+    parser.add_argument("--source", default="readings", help="Collection to copy from (default: readings)")
+    parser.add_argument("--target", default="readings_ts", help="Time-series collection to copy into (default: readings_ts)")
+    parser.add_argument("--granularity", choices=["seconds", "minutes", "hours"], default="minutes")
+    parser.add_argument("--chunk", type=int, default=5000, help="Documents per insert (default: 5000)")
+    parser.add_argument("--swap", action="store_true", help="Rename the collections once the copy is complete")
+    asyncio.run(main(parser.parse_args()))
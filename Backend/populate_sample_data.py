@@ -1,23 +1,22 @@
 #!/usr/bin/env python3
 """
 Populate MongoDB with sample sensor data for testing.
-Creates multiple sensors with readings over the past 30 days.
+Creates one sensor with readings every 2 hours over the past 30 days.
+For fleet-sized data sets use generate_fleet.py.
 """
 
 import asyncio
+import math
 import random
 from datetime import datetime, timedelta, timezone
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
-import os
 from dotenv import load_dotenv
 
-from app.models import Sensor, Reading
-
 load_dotenv()
 
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = os.getenv("MONGODB_DATABASE", "airiq")
+from app.db import init_db, close_db
+from app.models import Sensor, Reading
+from app.services.latest import rebuild_latest
+from app.services.rollups import rebuild_rollups
 
 # Single sensor location
 SENSOR = {
@@ -54,12 +53,14 @@ def generate_reading(base_time, sensor_id, variation=0):
 async def populate_data():
     """Populate database with sample data"""
     print("Connecting to MongoDB...")
-    client = AsyncIOMotorClient(MONGODB_URL)
-    await init_beanie(
-        database=client[DATABASE_NAME],
-        document_models=[Sensor, Reading]
-    )
-    
+    # Registers every document model, including sensor_latest and the rollups
+    await init_db()
+    try:
+        await _populate()
+    finally:
+        await close_db()
+
+async def _populate():
     print("Creating sensor...")
     # Create or update sensor
     existing = await Sensor.get(SENSOR["id"])
@@ -76,41 +77,33 @@ async def populate_data():
     print("\nGenerating readings...")
     now = datetime.now(timezone.utc)
     
-    # Generate readings for the past 30 days
-    # Create readings every 2 hours for the past 30 days
-    total_readings = 0
+    # Generate readings every 2 hours for the past 30 days
+    readings = []
     for days_ago in range(30):
         date = now - timedelta(days=days_ago)
         for hour in range(0, 24, 2):  # Every 2 hours
             reading_time = date.replace(hour=hour, minute=0, second=0, microsecond=0)
-            
-            # Generate reading for the single sensor
-            reading_data = {
-                "sensor_id": SENSOR["id"],
-                    "ts": reading_time,
-                    "pm25": round(random.uniform(5, 35), 1),
-                    "pm10": round(random.uniform(10, 60), 1),
-                    "co2": round(random.uniform(500, 1200), 0),
-                    "no2": round(random.uniform(0.005, 0.03), 3),
-                    "temp_c": round(20 + random.uniform(-3, 5), 1),
-                    "rh": round(40 + random.uniform(-10, 20), 1),
-                    "battery": round(random.uniform(85, 100), 1),
-                    "firmware": "1.0.0"
-                }
-                
-                reading = Reading(**reading_data)
-                await reading.insert()
-                total_readings += 1
+            if reading_time > now:
+                continue
+            readings.append(Reading(**generate_reading(reading_time, SENSOR["id"])))
+
+    # One round trip instead of one insert per reading
+    await Reading.insert_many(readings)
+    total_readings = len(readings)
+    
+    # The map and the hourly/daily charts read these, not raw readings
+    print("Rebuilding sensor_latest and rollups...")
+    await rebuild_latest()
+    start = min(r.ts for r in readings)
+    end = max(r.ts for r in readings) + timedelta(milliseconds=1)
+    await rebuild_rollups(start, end, sensor_id=SENSOR["id"])
     
     print(f"\n✓ Successfully created {total_readings} readings for sensor {SENSOR['id']}")
     print(f"✓ Data spans the last 30 days")
     print(f"\nYou can now view the data at:")
     print(f"  Frontend: http://localhost:3000")
     print(f"  API: http://localhost:8003/api/v1/sensors")
-    
-    client.close()
 
 if __name__ == "__main__":
-    import math
     asyncio.run(populate_data())
 
@@ -4,9 +4,12 @@ Raspberry Pi Sensor Client for AirIQ
 
 This script runs on the Raspberry Pi and:
 1. Reads sensor data from connected sensors
-2. Sends data to the AirIQ backend API
-3. Handles errors and retries
+2. Records every reading in a local SQLite spool before sending
+3. Drains the spool oldest-first to the AirIQ backend in batches, so
+   readings taken during a network outage are delivered once it is back
 4. Runs continuously at specified intervals
+5. Optionally (AIRIQ_SAMPLE_INTERVAL) samples every few seconds and reports
+   mean/min/max/p95 and the sample count per metric once per interval
 
 Hardware Requirements:
 - PM2.5/PM10 sensor (e.g., PMS5003)
@@ -24,6 +27,8 @@ Installation on Raspberry Pi:
    - Set DEVICE_KEY to your API key
    - Set SENSOR_ID to unique sensor identifier
    - Adjust sensor pin numbers as needed
+   - Optionally set AIRIQ_SPOOL_PATH / AIRIQ_SPOOL_MAX_ROWS to place and
+     bound the on-device spool (oldest readings are evicted first)
 
 3. Run as a service:
    sudo systemctl enable airiq-sensor.service
@@ -34,16 +39,23 @@ import time
 import json
 import requests
 import os
+import sqlite3
+import math
+from collections import deque
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import logging
 
 # Configuration
 BACKEND_URL = os.getenv("AIRIQ_BACKEND_URL", "http://localhost:8003")
-API_ENDPOINT = f"{BACKEND_URL}/api/v1/ingest"
+API_ENDPOINT = f"{BACKEND_URL}/api/v1/ingest/batch"
 DEVICE_KEY = os.getenv("AIRIQ_DEVICE_KEY", "pi-key-1")
 SENSOR_ID = os.getenv("AIRIQ_SENSOR_ID", "AIRIQ-SENSOR-01")  # Single sensor ID
 READING_INTERVAL = int(os.getenv("AIRIQ_INTERVAL", "300"))  # 5 minutes default
+SAMPLE_INTERVAL = int(os.getenv("AIRIQ_SAMPLE_INTERVAL", "0"))  # seconds; 0 = one sample per report
+SPOOL_PATH = os.getenv("AIRIQ_SPOOL_PATH", os.path.expanduser("~/.airiq/spool.db"))
+SPOOL_MAX_ROWS = int(os.getenv("AIRIQ_SPOOL_MAX_ROWS", "100000"))  # ~30 MB, a year at 5 minutes
+SEND_BATCH_SIZE = int(os.getenv("AIRIQ_SEND_BATCH", "200"))
 
 # Logging setup
 logging.basicConfig(
@@ -216,28 +228,26 @@ def read_battery() -> Optional[float]:
         logger.error(f"Error reading battery: {e}")
         return None
 
-def collect_sensor_data() -> Dict[str, Any]:
-    """Collect data from all available sensors"""
-    logger.info("Collecting sensor data...")
-    
-    # Read from all sensors
+def read_sensors() -> Dict[str, Optional[float]]:
+    """Take one sample from every sensor"""
     pm25, pm10 = read_pm25_pm10()
-    co2 = read_co2()
-    no2 = read_no2()
     temp, humidity = read_temp_humidity()
-    battery = read_battery()
-    
-    # Prepare payload
-    payload = {
-        "sensor_id": SENSOR_ID,
-        "ts": datetime.now(timezone.utc).isoformat(),
+    return {
         "pm25": pm25,
         "pm10": pm10,
-        "co2": co2,
-        "no2": no2,
+        "co2": read_co2(),
+        "no2": read_no2(),
         "temp_c": temp,
         "rh": humidity,
-        "battery": battery,
+        "battery": read_battery(),
+    }
+
+def make_payload(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap sensor values in the JSON the backend expects"""
+    payload = {
+        "sensor_id": SENSOR_ID,
+        "ts": datetime.now(timezone.utc).isoformat(),
+        **values,
         "firmware": "1.0.0"
     }
     
@@ -246,37 +256,160 @@ def collect_sensor_data() -> Dict[str, Any]:
     
     return payload
 
-def send_to_backend(payload: Dict[str, Any], max_retries: int = 3) -> bool:
-    """Send sensor data to backend API with retry logic"""
-    headers = {
+def collect_sensor_data() -> Dict[str, Any]:
+    """Collect data from all available sensors"""
+    logger.info("Collecting sensor data...")
+    return make_payload(read_sensors())
+
+# Metrics summarized in sampling mode (battery is reported as its last value)
+SAMPLED_METRICS = ("pm25", "pm10", "co2", "no2", "temp_c", "rh")
+
+class Sampler:
+    """Fixed-size ring buffer of samples per metric, summarized once per report"""
+
+    def __init__(self, size: int):
+        self.buffers = {m: deque(maxlen=size) for m in SAMPLED_METRICS}
+        self.battery = None
+
+    def add(self, values: Dict[str, Optional[float]]):
+        for metric, buffer in self.buffers.items():
+            if values.get(metric) is not None:
+                buffer.append(values[metric])
+        if values.get("battery") is not None:
+            self.battery = values["battery"]
+
+    def sample_until(self, deadline: float):
+        """Sample every SAMPLE_INTERVAL seconds until the monotonic deadline"""
+        while True:
+            self.add(read_sensors())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(SAMPLE_INTERVAL, remaining))
+
+    def report(self) -> Dict[str, Any]:
+        """Payload with the mean of each metric and its full summary under "stats"; empties the buffers"""
+        values: Dict[str, Any] = {"battery": self.battery}
+        stats = {}
+        for metric, buffer in self.buffers.items():
+            if not buffer:
+                values[metric] = None
+                continue
+            ordered = sorted(buffer)
+            n = len(ordered)
+            mean = sum(ordered) / n
+            values[metric] = round(mean, 3)
+            stats[metric] = {
+                "mean": round(mean, 3),
+                "min": ordered[0],
+                "max": ordered[-1],
+                "p95": ordered[math.ceil(0.95 * n) - 1],  # nearest-rank
+                "n": n,
+            }
+            buffer.clear()
+        if stats:
+            values["stats"] = stats
+        return make_payload(values)
+
+class Spool:
+    """Durable FIFO of readings waiting to be sent, kept in SQLite"""
+
+    def __init__(self, path: str, max_rows: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT NOT NULL, payload TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS spool_ts ON spool (ts, id)")
+        self.conn.commit()
+
+    def add(self, payload: Dict[str, Any]):
+        """Record a reading, evicting the oldest ones beyond max_rows"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO spool (ts, payload) VALUES (?, ?)",
+                (payload["ts"], json.dumps(payload)),
+            )
+            evicted = self.conn.execute(
+                "DELETE FROM spool WHERE id IN ("
+                "SELECT id FROM spool ORDER BY ts, id LIMIT max(0, (SELECT count(*) FROM spool) - ?))",
+                (self.max_rows,),
+            ).rowcount
+        if evicted:
+            logger.warning(f"Spool full, evicted {evicted} oldest reading(s)")
+
+    def peek(self, limit: int) -> List[tuple[int, Dict[str, Any]]]:
+        """Oldest readings first, as (row id, payload)"""
+        rows = self.conn.execute(
+            "SELECT id, payload FROM spool ORDER BY ts, id LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def remove(self, row_ids: List[int]):
+        with self.conn:
+            self.conn.executemany("DELETE FROM spool WHERE id = ?", [(i,) for i in row_ids])
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM spool").fetchone()[0]
+
+def make_session() -> requests.Session:
+    """Keep-alive session reused for every request to the backend"""
+    session = requests.Session()
+    session.headers.update({
         "Authorization": f"Bearer {DEVICE_KEY}",
         "Content-Type": "application/json"
-    }
-    
-    for attempt in range(max_retries):
+    })
+    return session
+
+def send_to_backend(session: requests.Session, spool: Spool) -> bool:
+    """Send spooled readings in timestamp order; True once the spool is empty"""
+    while True:
+        batch = spool.peek(SEND_BATCH_SIZE)
+        if not batch:
+            return True
+
         try:
-            response = requests.post(
+            response = session.post(
                 API_ENDPOINT,
-                headers=headers,
-                json=payload,
+                json=[payload for _, payload in batch],
                 timeout=10
             )
-            
-            if response.status_code == 200:
-                logger.info(f"Data sent successfully: {response.json()}")
-                return True
-            else:
-                logger.warning(f"Backend returned status {response.status_code}: {response.text}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending data (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
-    
-    logger.error("Failed to send data after all retries")
-    return False
+            logger.error(f"Error sending data, {len(spool)} reading(s) kept in spool: {e}")
+            return False
+
+        if response.status_code == 429:
+            # Rate limited while catching up: wait as told and keep draining
+            time.sleep(int(response.headers.get("Retry-After", "1")))
+            continue
+
+        if response.status_code != 200:
+            logger.warning(f"Backend returned status {response.status_code}: {response.text}")
+            return False
+
+        # Drop what was stored and what the backend will never accept;
+        # readings that failed to write (they carry a sensor_id) stay queued
+        done, retry = [], 0
+        for result in response.json()["results"]:
+            row_id, payload = batch[result["index"]]
+            if result["ok"]:
+                done.append(row_id)
+            elif "sensor_id" in result:
+                retry += 1
+            else:
+                logger.error(f"Backend rejected reading {payload.get('ts')}: {result['error']}")
+                done.append(row_id)
+        spool.remove(done)
+        logger.info(f"Sent {len(done)} reading(s), {len(spool)} left in spool")
+        if retry:
+            logger.warning(f"{retry} reading(s) failed to store, will retry on next cycle")
+            return False
 
 def main_loop():
     """Main loop: collect and send data at intervals"""
@@ -285,23 +418,38 @@ def main_loop():
     logger.info(f"Sensor ID: {SENSOR_ID}")
     logger.info(f"Reading interval: {READING_INTERVAL} seconds")
     
+    logger.info(f"Spool: {SPOOL_PATH} (max {SPOOL_MAX_ROWS} readings)")
+    if SAMPLE_INTERVAL > 0:
+        logger.info(f"Sampling every {SAMPLE_INTERVAL} seconds")
+    
     init_sensors()
+    spool = Spool(SPOOL_PATH, SPOOL_MAX_ROWS)
+    session = make_session()
+    sampler = None
+    if SAMPLE_INTERVAL > 0:
+        sampler = Sampler(math.ceil(READING_INTERVAL / SAMPLE_INTERVAL) + 1)
     
     while True:
         try:
-            # Collect sensor data
-            payload = collect_sensor_data()
+            # Collect sensor data and record it before anything can fail
+            if sampler:
+                sampler.sample_until(time.monotonic() + READING_INTERVAL)
+                payload = sampler.report()
+            else:
+                payload = collect_sensor_data()
+            spool.add(payload)
             
-            # Send to backend
-            success = send_to_backend(payload)
+            # Send everything that is waiting, oldest first
+            success = send_to_backend(session, spool)
             
             if success:
                 logger.info(f"Waiting {READING_INTERVAL} seconds until next reading...")
             else:
-                logger.warning("Failed to send data, will retry on next cycle")
+                logger.warning(f"{len(spool)} reading(s) kept in spool, will retry on next cycle")
             
-            # Wait for next reading
-            time.sleep(READING_INTERVAL)
+            # Wait for next reading (sampling mode spends the interval sampling)
+            if not sampler:
+                time.sleep(READING_INTERVAL)
             
         except KeyboardInterrupt:
             logger.info("Shutting down...")
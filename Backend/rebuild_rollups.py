@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Recompute the readings_1h / readings_1d rollups from raw readings.
+
+Examples:
+    python rebuild_rollups.py                                   # everything
+    python rebuild_rollups.py --start 2025-01-01 --end 2025-02-01
+    python rebuild_rollups.py --sensor AIRIQ-SENSOR-01 --start 2025-01-15
+
+Buckets overlapping the range are replaced, so run it while ingest for the
+affected sensors is quiet (e.g. after a bulk import).
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db import init_db, close_db
+from app.models import Reading
+from app.services.rollups import rebuild_rollups
+
+def parse_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+async def main(args):
+    print("Connecting to MongoDB...")
+    await init_db()
+    try:
+        collection = Reading.get_motor_collection()
+        start = args.start
+        end = args.end
+        # Default to the full extent of the readings collection
+        if start is None:
+            first = await collection.find_one({}, sort=[("ts", 1)])
+            if not first:
+                print("No readings found, nothing to do")
+                return
+            start = first["ts"]
+        if end is None:
+            last = await collection.find_one({}, sort=[("ts", -1)])
+            # End is exclusive; step past the newest reading so it is included
+            end = last["ts"] + timedelta(milliseconds=1)
+
+        print(f"Rebuilding rollups from {start} to {end}...")
+        counts = await rebuild_rollups(start, end, sensor_id=args.sensor)
+        for name, written in counts.items():
+            print(f"  ✓ {name}: {written} bucket(s)")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild reading rollups")
+    parser.add_argument("--start", type=parse_ts, help="ISO start (default: oldest reading)")
+    parser.add_argument("--end", type=parse_ts, help="ISO end, exclusive (default: newest reading)")
+    parser.add_argument("--sensor", help="Only rebuild this sensor")
+    asyncio.run(main(parser.parse_args()))
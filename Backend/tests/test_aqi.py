@@ -0,0 +1,49 @@
+'''
+Breakpoint checks for the AQI engine (run with: python -m pytest tests).
+'''
+
+import pytest
+from app.services import aqi
+
+def _score(pollutant, value):
+    return aqi.to_ints(aqi.aqi_batch(pollutant, [value]))[0]
+
+@pytest.mark.parametrize("value, expected", [
+    (54, 50),
+    (55, 51),
+    (424, 300),
+    (425, 301),
+    (504, 400),
+    (505, 401),
+    (604, 500),
+])
+def test_pm10_breakpoints(value, expected):
+    assert _score("pm10", value) == expected
+
+@pytest.mark.parametrize("ppb, expected", [
+    (53, 50),
+    (54, 51),
+    (1249, 300),
+    (1250, 301),
+    (1649, 400),
+    (1650, 401),
+    (2049, 500),
+])
+def test_no2_breakpoints(ppb, expected, monkeypatch):
+    # Tables are in ppb; readings default to ppm
+    monkeypatch.setattr(aqi, "NO2_SCALE", 1.0)
+    assert _score("no2", ppb) == expected
+
+def test_no2_ppm_readings_are_scaled():
+    assert _score("no2", 1650 / aqi.NO2_SCALE) == 401
+
+def test_pm25_interpolation_and_category():
+    assert aqi.pm25_to_aqi(9.0) == (50, "Good")
+    assert aqi.pm25_to_aqi(9.1) == (51, "Moderate")
+    assert aqi.pm25_to_aqi(None) == (None, None)
+
+def test_tables_are_contiguous():
+    for pollutant, rows in aqi.BREAKPOINTS.items():
+        for (_, c_hi, _, i_hi), (c_lo, _, i_lo, _) in zip(rows, rows[1:]):
+            assert i_lo == i_hi + 1, pollutant
+            assert c_lo > c_hi, pollutant
@@ -16,6 +16,16 @@ export interface Reading {
   firmware?: string | null;
   aqi_pm25?: number | null;
   aqi_category?: string | null;
+  aqi_pm10?: number | null;
+  aqi_no2?: number | null;
+  aqi_co2?: number | null;
+}
+
+export type AggregateBucket = '5m' | '15m' | '1h' | '6h' | '1d';
+
+export interface AggregateRow {
+  ts: string;
+  [key: string]: number | string | null;
 }
 
 export interface MapLatestReading extends Reading {
@@ -59,6 +69,55 @@ export async function fetchReadings(params: {
   return response.json();
 }
 
+/**
+ * Fetch server-side time buckets (one row per bucket with <metric>_<stat> keys)
+ */
+export async function fetchAggregate(params: {
+  sensor_id?: string;
+  start?: string; // ISO datetime string
+  end?: string; // ISO datetime string
+  bucket: AggregateBucket;
+  stats?: string; // e.g. "avg" or "avg,min,max"
+  metrics?: string; // e.g. "temp_c,rh,co2"
+}): Promise<AggregateRow[]> {
+  const queryParams = new URLSearchParams();
+  if (params.sensor_id) queryParams.append('sensor_id', params.sensor_id);
+  if (params.start) queryParams.append('start', params.start);
+  if (params.end) queryParams.append('end', params.end);
+  queryParams.append('bucket', params.bucket);
+  if (params.stats) queryParams.append('stats', params.stats);
+  if (params.metrics) queryParams.append('metrics', params.metrics);
+  // Align buckets with the browser's local hours/days
+  queryParams.append('tz_offset', (-new Date().getTimezoneOffset()).toString());
+
+  const url = `${API_BASE_URL}${API_V1_PREFIX}/readings/aggregate?${queryParams.toString()}`;
+  const response = await fetch(url);
+
+  if (!response.ok) {
+    throw new Error(`Failed to fetch aggregated readings: ${response.statusText}`);
+  }
+  return response.json();
+}
+
+/**
+ * Fetch bucket averages shaped like readings, so the chart transforms can use them directly
+ */
+async function fetchBucketAverages(params: {
+  sensor_id?: string;
+  start: string;
+  end: string;
+  bucket: AggregateBucket;
+}): Promise<Reading[]> {
+  const rows = await fetchAggregate({ ...params, stats: 'avg', metrics: 'temp_c,rh,co2' });
+  return rows.map((row) => ({
+    sensor_id: params.sensor_id ?? '',
+    ts: row.ts,
+    temp_c: row.temp_c_avg as number | null,
+    rh: row.rh_avg as number | null,
+    co2: row.co2_avg as number | null,
+  }));
+}
+
 /**
  * Get the latest reading (for current metrics display)
  * Returns the most recent reading from any sensor
@@ -76,7 +135,7 @@ export async function getCurrentReading(): Promise<MapLatestReading | null> {
 }
 
 /**
- * Get daily readings for today (24 hours)
+ * Get hourly averages for today (24 hours)
  */
 export async function getDailyReadings(sensorId?: string): Promise<Reading[]> {
   const now = new Date();
@@ -85,27 +144,27 @@ export async function getDailyReadings(sensorId?: string): Promise<Reading[]> {
   const endOfDay = new Date(now);
   endOfDay.setHours(23, 59, 59, 999);
 
-  return fetchReadings({
+  return fetchBucketAverages({
     sensor_id: sensorId,
     start: startOfDay.toISOString(),
     end: endOfDay.toISOString(),
-    limit: 10000,
+    bucket: '1h',
   });
 }
 
 /**
- * Get monthly readings (last 30 days)
+ * Get daily averages for the last 30 days
  */
 export async function getMonthlyReadings(sensorId?: string): Promise<Reading[]> {
   const now = new Date();
   const thirtyDaysAgo = new Date(now);
   thirtyDaysAgo.setDate(thirtyDaysAgo.getDate() - 30);
 
-  return fetchReadings({
+  return fetchBucketAverages({
     sensor_id: sensorId,
     start: thirtyDaysAgo.toISOString(),
     end: now.toISOString(),
-    limit: 20000,
+    bucket: '1d',
   });
 }
 